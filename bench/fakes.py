@@ -0,0 +1,134 @@
+"""
+Подставные внешние сервисы для бенчмарка: локальный сервер вместо api.hh.ru
+и сессия бота, которая не ходит в Telegram, а только запоминает отправки.
+"""
+import asyncio
+import hashlib
+import itertools
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.methods import SendMessage, TelegramMethod
+from aiogram.types import Chat, Message
+from aiohttp import web
+
+from utils.telegram_limiter import TelegramSendLimiter, ThrottlingRequestMiddleware
+
+
+class FakeHHServer:
+    """
+    Локальная заглушка API hh.ru: GET /vacancies отдаёт детерминированную выдачу
+    для каждого запроса (text, area) с заданной задержкой ответа.
+    """
+
+    def __init__(self, vacancies_per_query: int = 20, latency: float = 0.05, host: str = "127.0.0.1", port: int = 0):
+        self.vacancies_per_query = vacancies_per_query
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.calls = 0
+        self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/vacancies"
+
+    def _items(self, text: str, area: str, page: int, per_page: int) -> list[dict]:
+        # у каждого запроса свой диапазон id, чтобы разные запросы не пересекались
+        base = int(hashlib.md5(f"{text}|{area}".encode()).hexdigest()[:6], 16) * 1000
+        published = datetime.now(timezone(timedelta(hours=3)))
+        start = page * per_page
+        stop = min(start + per_page, self.vacancies_per_query)
+        return [
+            {
+                "id": str(base + i),
+                "name": f"{text or 'Python'} developer #{i}",
+                "alternate_url": f"https://hh.ru/vacancy/{base + i}",
+                "published_at": (published - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "employer": {"name": f"Company {i % 50}"},
+                "salary": {"from": 100000 + i * 1000, "to": None, "currency": "RUR"},
+                "snippet": {"requirement": f"Опыт работы с {text or 'Python'}", "responsibility": "Разработка"},
+            }
+            for i in range(start, stop)
+        ]
+
+    async def handle_vacancies(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        query = request.query
+        per_page = int(query.get("per_page", 20))
+        page = int(query.get("page", 0))
+        return web.json_response({
+            "items": self._items(query.get("text", ""), query.get("area", ""), page, per_page),
+            "found": self.vacancies_per_query,
+            "pages": max(math.ceil(self.vacancies_per_query / per_page), 1),
+            "page": page,
+            "per_page": per_page,
+        })
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/vacancies", self.handle_vacancies)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        # при port=0 порт выбирает система
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class FakeSession(BaseSession):
+    """
+    HTTP-сессия бота без Telegram: каждый запрос только запоминает, кому и когда ушло сообщение.
+    Middleware сессии (ThrottlingRequestMiddleware) при этом работают как в продакшене.
+    latency имитирует время ответа Bot API.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.sends: list[tuple[int, float]] = []  # (chat_id, время отправки по time.time())
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int | None = None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        chat_id = getattr(method, "chat_id", None)
+        self.sends.append((chat_id, time.time()))
+        if isinstance(method, SendMessage):
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(timezone.utc),
+                chat=Chat(id=chat_id, type="private"),
+                text=method.text,
+            )
+        return True
+
+    async def stream_content(self, url: str, headers: dict | None = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True):
+        # бенчмарк файлов не скачивает: пустой поток
+        for chunk in ():
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+def fake_bot(latency: float = 0.0, limiter: bool = True) -> Bot:
+    """
+    Настоящий aiogram.Bot поверх FakeSession. С limiter=True к сессии подключается
+    ThrottlingRequestMiddleware, как в main.py, — отправки упираются в лимиты Telegram.
+    """
+    bot = Bot("42:BENCH", session=FakeSession(latency), default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    if limiter:
+        bot.session.middleware(ThrottlingRequestMiddleware(TelegramSendLimiter()))
+    return bot
@@ -0,0 +1,61 @@
+"""
+Хранилище подписок в памяти для бенчмарка — повторяет функции db.py,
+которыми пользуется планировщик, чтобы бенчмарк запускался без MongoDB.
+"""
+from datetime import datetime
+from typing import AsyncIterator
+
+
+def _project(doc: dict, projection: dict | None) -> dict:
+    if not projection:
+        return dict(doc)
+    return {key: doc[key] for key in projection if key in doc}
+
+
+def _is_due(doc: dict, until: datetime) -> bool:
+    next_due = doc.get("next_due")
+    return next_due is None or next_due <= until
+
+
+def _in_shards(doc: dict, shards) -> bool:
+    return shards is None or doc.get("shard") in shards
+
+
+class MemoryStore:
+    """Подписки по _id; методы совпадают по сигнатурам с одноимёнными функциями db.py."""
+
+    def __init__(self):
+        self.subscriptions: dict = {}
+        self.ops = 0  # сколько «запросов к базе» выполнил планировщик
+
+    def insert_many(self, docs: list[dict]):
+        for doc in docs:
+            self.subscriptions[doc["_id"]] = doc
+
+    async def iter_due_subscriptions(self, until: datetime, projection: dict, batch_size: int,
+                                     shards=None) -> AsyncIterator[dict]:
+        self.ops += 1
+        for i, doc in enumerate(list(self.subscriptions.values())):
+            if i % batch_size == 0 and i:
+                self.ops += 1  # getMore
+            if _is_due(doc, until) and _in_shards(doc, shards):
+                yield _project(doc, projection)
+
+    async def find_due_subscriptions(self, sub_ids: list, now: datetime, projection: dict, shards=None) -> list[dict]:
+        self.ops += 1
+        result = []
+        for sub_id in sub_ids:
+            doc = self.subscriptions.get(sub_id)
+            if doc is not None and _is_due(doc, now) and _in_shards(doc, shards):
+                result.append(_project(doc, projection))
+        return result
+
+    async def bulk_update_subscriptions(self, updates: dict):
+        self.ops += 1
+        for sub_id, update in updates.items():
+            doc = self.subscriptions.get(sub_id)
+            if doc is None:
+                continue
+            doc.update(update.get("$set", {}))
+            for name, value in update.get("$inc", {}).items():
+                doc[name] = doc.get(name, 0) + value
@@ -0,0 +1,207 @@
+"""
+Бенчмарк пропускной способности планировщика рассылки.
+
+Генерирует N синтетических подписок, созревших к моменту запуска, и выполняет один
+проход планировщика (подгрузка очереди + обработка созревших подписок) против
+локальной заглушки hh.ru и бота без Telegram. Работает без сети.
+
+Отправки проходят через ThrottlingRequestMiddleware, как в продакшене, поэтому при
+числе подписок больше TG_GLOBAL_RATE результат упирается в лимит Telegram;
+с --no-tg-limiter измеряется сам планировщик. Архив вакансий на время прогона отключается.
+
+Запуск:
+    python -m bench.scheduler_bench --subs 10000
+    python -m bench.scheduler_bench --subs 100000 --queries 2000 --hh-latency 0.1
+    python -m bench.scheduler_bench --subs 10000 --mongo-uri mongodb://localhost:27017
+    python -m bench.scheduler_bench --subs 10000 --no-tg-limiter
+
+По умолчанию подписки хранятся в памяти (bench.memory_store); с --mongo-uri —
+в отдельной базе MongoDB, которая удаляется после прогона.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import resource
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+import db
+import jobs.scheduler as scheduler
+import jobs.write_back as write_back
+import utils.hh_api as hh_api
+from bench.fakes import FakeHHServer, fake_bot
+from bench.memory_store import MemoryStore
+from config import CITIES
+from jobs.due_queue import DueQueue, from_minute, to_minute
+from jobs.leases import shard_of
+from utils.http_client import close_session
+from utils.telegram_limiter import send_priority, PRIORITY_BROADCAST
+
+KEYWORDS = [
+    "python", "django", "fastapi", "flask", "data engineer", "ml", "backend", "aiohttp",
+    "asyncio", "pandas", "airflow", "devops", "qa automation", "celery", "postgresql",
+]
+LEVELS = ["junior", "middle", "senior", None]
+BENCH_DB_NAME = "job_bot_bench"
+
+
+def generate_subscriptions(count: int, queries: int, now: datetime, spread_minutes: int, seed: int) -> list[dict]:
+    """
+    Синтетические подписки: queries уникальных поисковых запросов, распределённых между count подписками.
+    next_due каждой подписки — случайный момент за последние spread_minutes минут.
+    """
+    rnd = random.Random(seed)
+    areas = list(CITIES)
+    pool = []
+    for i in range(queries):
+        keywords = KEYWORDS[i % len(KEYWORDS)]
+        if i >= len(KEYWORDS):
+            keywords = f"{keywords} {i}"
+        pool.append((keywords, LEVELS[i % len(LEVELS)], areas[i % len(areas)]))
+
+    subs = []
+    for user_id in range(1, count + 1):
+        keywords, level, area = rnd.choice(pool)
+        subs.append({
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "shard": shard_of(user_id),
+            "keywords": keywords,
+            "level": level,
+            "area": area,
+            "frequency": "daily",
+            "last_sent": None,
+            "next_due": now - timedelta(minutes=rnd.uniform(0, spread_minutes)),
+        })
+    return subs
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def memory_mb() -> tuple[float, float]:
+    """Текущий и пиковый RSS процесса, мегабайты."""
+    try:
+        with open("/proc/self/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(status["VmRSS"].split()[0]) / 1024, int(status["VmHWM"].split()[0]) / 1024
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return peak, peak
+
+
+def use_memory_store(store: MemoryStore):
+    """Подменяет функции db.py в планировщике на хранилище в памяти."""
+    scheduler.iter_due_subscriptions = store.iter_due_subscriptions
+    scheduler.find_due_subscriptions = store.find_due_subscriptions
+    write_back.bulk_update_subscriptions = store.bulk_update_subscriptions
+
+
+async def load_mongo(subs: list[dict], uri: str, chunk: int = 10000):
+    """Записывает подписки в отдельную базу бенчмарка."""
+    db.MONGO_URI = uri
+    db.MONGO_DB_NAME = BENCH_DB_NAME
+    await db.get_client().drop_database(BENCH_DB_NAME)
+    await db.ensure_indexes()
+    for i in range(0, len(subs), chunk):
+        await db.subscriptions_collection().insert_many(subs[i:i + chunk], ordered=False)
+
+
+async def run(args) -> dict:
+    now = datetime.now(timezone.utc)
+    subs = generate_subscriptions(args.subs, args.queries, now, args.spread_minutes, args.seed)
+    due_at = {sub["user_id"]: sub["next_due"].timestamp() for sub in subs}
+
+    store = None
+    if args.mongo_uri:
+        await load_mongo(subs, args.mongo_uri)
+    else:
+        store = MemoryStore()
+        store.insert_many(subs)
+        use_memory_store(store)
+    del subs
+
+    hh = FakeHHServer(vacancies_per_query=args.vacancies, latency=args.hh_latency)
+    await hh.start()
+    hh_api.HH_API_URL = hh.url
+    bot = fake_bot(latency=args.send_latency, limiter=not args.no_tg_limiter)
+    # бенчмарк не должен писать файлы архива вакансий
+    scheduler.ARCHIVE_ENABLED = False
+    # как в daily_job_sending: рассылка идёт с приоритетом фоновой
+    send_priority.set(PRIORITY_BROADCAST)
+    rss_before, _ = memory_mb()
+
+    try:
+        started = time.perf_counter()
+        # один проход daily_job_sending: подгрузка очереди и обработка всего созревшего
+        queue = DueQueue()
+        loaded = await scheduler.refill_queue(queue, now)
+        # планировщик просыпается на границе минуты, к которой созревают подписки
+        due_ids = queue.pop_due(from_minute(to_minute(now)))
+        processed = await scheduler.process_due(bot, due_ids, now, {})
+        elapsed = time.perf_counter() - started
+    finally:
+        await hh.stop()
+        await close_session()
+        if args.mongo_uri:
+            if not args.keep:
+                await db.get_client().drop_database(BENCH_DB_NAME)
+            await db.close_db()
+
+    sends = bot.session.sends
+    lags = [sent_at - due_at[chat_id] for chat_id, sent_at in sends]
+    rss_after, rss_peak = memory_mb()
+    return {
+        "subscriptions": args.subs,
+        "loaded": loaded,
+        "processed": processed,
+        "elapsed_s": round(elapsed, 3),
+        "subs_per_s": round(processed / elapsed, 1) if elapsed else 0.0,
+        "hh_api_calls": hh.calls,
+        "db_ops": store.ops if store is not None else None,
+        "tg_limiter": not args.no_tg_limiter,
+        "sends": len(sends),
+        "send_lag_p50_s": round(percentile(lags, 50), 3),
+        "send_lag_p99_s": round(percentile(lags, 99), 3),
+        "rss_before_run_mb": round(rss_before, 1),
+        "rss_after_run_mb": round(rss_after, 1),
+        "rss_peak_mb": round(rss_peak, 1),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарк пропускной способности планировщика рассылки")
+    parser.add_argument("--subs", type=int, default=10000, help="сколько подписок сгенерировать (10k, 100k, 1M)")
+    parser.add_argument("--queries", type=int, default=500, help="сколько уникальных поисковых запросов среди подписок")
+    parser.add_argument("--vacancies", type=int, default=20, help="сколько вакансий отдаёт заглушка hh.ru на запрос")
+    parser.add_argument("--hh-latency", type=float, default=0.05, help="задержка ответа заглушки hh.ru, секунды")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="задержка одной отправки бота, секунды")
+    parser.add_argument("--spread-minutes", type=float, default=0.0,
+                        help="за сколько минут до запуска распределены next_due подписок")
+    parser.add_argument("--no-tg-limiter", action="store_true",
+                        help="не подключать ограничитель Telegram: измерить сам планировщик")
+    parser.add_argument("--mongo-uri", default=None, help="использовать MongoDB вместо хранилища в памяти")
+    parser.add_argument("--keep", action="store_true", help="не удалять базу бенчмарка после прогона")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="WARNING", help="уровень логов бота во время прогона")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.getLogger("job_bot").setLevel(args.log_level)
+    result = asyncio.run(run(args))
+    width = max(len(key) for key in result)
+    for key, value in result.items():
+        print(f"{key.ljust(width)}  {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,22 @@
 BOT_TOKEN = "yourtoken"
 
+# получение апдейтов: "polling" — long polling (удобно для разработки), "webhook" — через HTTP-сервер
+BOT_MODE = "polling"
+WEBHOOK_BASE_URL = "https://example.com"   # публичный адрес, по которому Telegram доступен бот
+WEBHOOK_PATH = "/telegram/webhook"
+WEBHOOK_SECRET = "change-me"               # сверяется с заголовком X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_HOST = "0.0.0.0"                   # адрес, на котором слушает сервер вебхука
+WEBHOOK_PORT = 8080
+WEBHOOK_WORKERS = 64                       # сколько апдейтов обрабатывать одновременно
+WEBHOOK_DRAIN_TIMEOUT = 30                 # сколько секунд дорабатывать принятые апдейты при остановке
+
 MONGO_URI = "mongodb://localhost:27017"
 MONGO_DB_NAME = "job_subscribe_bot"
+MONGO_MAX_POOL_SIZE = 100                 # максимум соединений в пуле MongoDB
+MONGO_MIN_POOL_SIZE = 0                   # сколько соединений держать открытыми постоянно
+MONGO_CONNECT_TIMEOUT_MS = 5000           # таймаут установки соединения
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000  # сколько ждать доступный сервер, прежде чем вернуть ошибку
+MONGO_SOCKET_TIMEOUT_MS = 10000           # таймаут одной операции чтения/записи
 
 CITIES = {
     "1": "Москва",
@@ -10,3 +25,124 @@ CITIES = {
     "4": "Новосибирск",
     "5": "Казань"
 }
+
+# параметры общего пула HTTP-соединений (aiohttp)
+HTTP_CONNECTION_LIMIT = 100          # максимум одновременных соединений на весь процесс
+HTTP_CONNECTION_LIMIT_PER_HOST = 20  # максимум соединений к одному хосту
+HTTP_KEEPALIVE_TIMEOUT = 30          # сколько секунд держать простаивающее keep-alive соединение
+
+# параметры клиента API hh.ru
+HH_API_URL = "https://api.hh.ru/vacancies"
+HH_SEARCH_URL = "https://hh.ru/search/vacancy"  # страница поиска на сайте, для кнопки «Ещё вакансии»
+HH_API_TIMEOUT = 10          # общий таймаут запроса, секунды
+HH_API_CONNECT_TIMEOUT = 3   # таймаут установки соединения, секунды
+HH_HARVEST_CONCURRENCY = 4   # сколько страниц выдачи загружать параллельно в режиме сбора
+HH_MAX_DEPTH = 2000          # hh.ru отдаёт не больше 2000 вакансий на один поисковый запрос
+HH_RATE_MAX = 10             # предельный темп запросов к hh.ru, запросов/с
+HH_RATE_MIN = 0.5            # ниже этого темп не опускается даже при частых 429
+HH_RATE_STEP = 0.1           # на сколько запросов/с темп восстанавливается после каждого удачного запроса
+HH_RETRY_ATTEMPTS = 4        # сколько всего попыток делать для запросов планировщика
+HH_RETRY_ATTEMPTS_INTERACTIVE = 2  # и для запросов пользователей — им долго ждать нельзя
+HH_RETRY_BASE_DELAY = 0.5    # базовая пауза перед повтором, секунды (удваивается с каждой попыткой)
+HH_RETRY_MAX_DELAY = 10      # больше этого не ждём — ни паузы между попытками, ни Retry-After
+HH_BREAKER_FAILURES = 5      # после скольких неудач подряд считать hh.ru недоступным
+HH_BREAKER_COOLDOWN = 30     # сколько секунд не обращаться к hh.ru после этого
+
+# параметры фоновой рассылки вакансий
+SCHEDULER_MAX_ITEMS = 5         # сколько вакансий максимум отправлять по одной подписке за раз
+SCHEDULER_FETCH_PER_PAGE = 100  # размер страницы при сборе вакансий для группы одинаковых подписок
+SCHEDULER_HARVEST_MAX_PAGES = 5 # сколько страниц выдачи максимум собирать для одной группы
+SCHEDULER_BATCH_SIZE = 500      # сколько подписок читать из MongoDB и обрабатывать за один проход
+SCHEDULER_REFILL_SECONDS = 300  # как часто подгружать из MongoDB подписки в очередь планировщика
+SCHEDULER_HORIZON_SECONDS = 600 # на сколько вперёд подгружать подписки при каждой подгрузке
+SCHEDULER_FETCH_REUSE_SECONDS = 900  # сколько секунд можно переиспользовать уже полученный ответ hh.ru
+SCHEDULER_MIN_INTERVAL_MINUTES = 60  # минимальный допустимый интервал рассылки для произвольной частоты
+SCHEDULER_SHARDS = 64           # на сколько шардов (по user_id) делятся подписки между экземплярами бота
+SCHEDULER_LEASE_SECONDS = 60    # срок аренды шарда; за это время шарды упавшего экземпляра переходят к другим
+SCHEDULER_LEASE_RENEW_SECONDS = 20  # как часто продлевать аренды и перераспределять шарды
+SCHEDULER_WRITE_BATCH = 500     # после скольких изменённых подписок сбрасывать изменения в MongoDB одним bulk_write
+SCHEDULER_WRITE_FLUSH_SECONDS = 5  # и не реже, чем раз в столько секунд, даже если пачка не набралась
+SCHEDULER_RETRY_MINUTES = 15    # пауза перед повтором неудачной рассылки; удваивается с каждой неудачей подряд
+SCHEDULER_MODE = "query"        # "query" — запрос к hh.ru на каждую группу подписок; "index" — локальное сопоставление
+SENT_IDS_LIMIT = 200            # сколько id отправленных вакансий помнить по каждой подписке (6 байт на id)
+SENT_IDS_MAX_AGE_DAYS = 30      # сколько дней помнить отправленную вакансию
+DIGEST_ACCUMULATE_FROM_MINUTES = 2 * 24 * 60  # подписки с интервалом от стольких минут копят вакансии между рассылками
+DIGEST_HARVEST_MINUTES = 24 * 60  # как часто пополнять буфер такой подписки из общих запросов к hh.ru
+DIGEST_BUFFER_SIZE = 20         # сколько самых свежих вакансий хранить в буфере и отправлять в накопленном дайджесте
+
+# формат рассылки: все вакансии подписки одним сообщением (дайджестом) или по сообщению на вакансию
+DIGEST_MODE = True
+DIGEST_MESSAGE_LIMIT = 4096   # ограничение Telegram на длину одного сообщения
+DIGEST_MORE_BUTTON = True     # добавлять к дайджесту кнопку со ссылкой на полную выдачу hh.ru
+
+# ограничения частоты отправки сообщений в Telegram
+TG_GLOBAL_RATE = 30           # сообщений в секунду на всего бота
+TG_CHAT_RATE = 1              # сообщений в секунду в один личный чат
+TG_CHAT_BURST = 3             # допустимый короткий всплеск сообщений в один чат
+TG_GROUP_RATE = 20 / 60       # сообщений в секунду в одну группу (20 в минуту)
+TG_CHAT_BUCKETS_MAX = 10000   # сколько счётчиков чатов держать в памяти
+TG_MAX_RETRIES = 3            # сколько раз повторять отправку после RetryAfter
+
+# состояния диалогов (FSM) в MongoDB
+FSM_STATE_TTL = 24 * 3600     # через сколько секунд без действий брошенный диалог удаляется
+FSM_CACHE_SIZE = 10000        # сколько состояний держать в локальном кэше
+FSM_CACHE_TTL = 5             # сколько секунд доверять локальной копии состояния (только в режиме polling)
+
+# кэш настроек пользователей в памяти процесса
+SETTINGS_CACHE_SIZE = 10000   # сколько пользователей держать в кэше
+SETTINGS_CACHE_TTL = 300      # время жизни записи, секунды
+
+# кэш ответов hh.ru для интерактивного поиска /vacancies
+VACANCY_CACHE_SIZE = 1000        # сколько разных запросов держать в памяти
+VACANCY_CACHE_TTL = 300          # сколько секунд ответ считается свежим
+VACANCY_CACHE_STALE_TTL = 3600   # сколько секунд можно отдавать устаревший ответ, обновляя его в фоне
+
+# колоночный архив полученных вакансий и команда /trends
+ARCHIVE_ENABLED = True
+ARCHIVE_DIR = "data/archive"     # каталог архива; внутри — по каталогу на день публикации
+ARCHIVE_FLUSH_ROWS = 5000        # после скольких полученных вакансий дописывать архив на диск
+ARCHIVE_FLUSH_SECONDS = 60       # и не реже, чем раз в столько секунд
+ARCHIVE_OPEN_PARTITIONS = 60     # для скольких дней держать в памяти id записанных вакансий (защита от повторов)
+ARCHIVE_TRENDS_DAYS = 90         # за сколько дней считать статистику /trends
+ARCHIVE_TRENDS_TOP = 10          # сколько регионов показывать в /trends
+
+# режим локального сопоставления (SCHEDULER_MODE = "index")
+MATCHER_POLL_SECONDS = 300               # как часто забирать новые вакансии по каждому региону из CITIES
+MATCHER_INDEX_REFRESH_SECONDS = 600      # как часто перестраивать индекс подписок
+MATCHER_INITIAL_WINDOW_MINUTES = 24 * 60 # за какой период забирать вакансии при первом сборе после запуска
+MATCHER_PENDING_LIMIT = 50               # сколько совпавших вакансий копить по подписке до её рассылки
+MATCHER_MAX_PAGES = 20                   # сколько страниц по 100 вакансий забирать за один сбор по региону
+
+# новости Python из RSS-лент
+RSS_URLS = [
+    "https://planetpython.org/rss20.xml",
+    "https://www.python.org/events/python-events/rss/",
+    "https://realpython.com/atom.xml",
+    "https://pyfound.blogspot.com/feeds/posts/default",
+    "https://pycoders.com/feed/"
+]
+NEWS_TOP_N = 20               # сколько свежих записей держать в памяти
+NEWS_REFRESH_SECONDS = 600    # как часто обновлять ленты в фоне
+NEWS_FETCH_TIMEOUT = 10       # таймаут загрузки одной ленты, секунды
+
+# метрики в формате Prometheus на локальном HTTP-эндпоинте /metrics
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9100
+
+# профилирование обновлений в продакшене
+PROFILING_ENABLED = True
+PROFILE_DIR = "data/profiles"      # куда сохранять профили медленных обновлений
+PROFILE_SLOW_SECONDS = 2.0         # обновление дольше этого считается медленным и профилируется
+PROFILE_SAMPLE_INTERVAL = 0.05     # как часто снимать стек цикла событий и проверять его задержку, секунды
+PROFILE_LOOP_BLOCK_SECONDS = 0.25  # блокировка цикла событий дольше этого пишется в лог со стеком
+PROFILE_DUMP_COOLDOWN = 60         # не чаще одного профиля на хэндлер за столько секунд
+
+# проверка кода /pylint в пуле постоянно запущенных процессов
+PYLINT_WORKERS = 2                 # сколько процессов с pylint держать запущенными
+PYLINT_QUEUE_SIZE = 20             # сколько проверок может ждать свободный процесс
+PYLINT_TIMEOUT = 10                # ограничение времени одной проверки, секунды
+PYLINT_MEMORY_LIMIT_MB = 1024      # ограничение памяти процесса проверки, мегабайты
+PYLINT_MAX_TASKS_PER_CHILD = 200   # после скольких проверок процесс перезапускается
+PYLINT_CACHE_SIZE = 500            # сколько результатов проверок держать в кэше
+PYLINT_CACHE_TTL = 3600            # время жизни результата в кэше, секунды
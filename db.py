@@ -1,19 +1,295 @@
-from pymongo import MongoClient
-from config import MONGO_URI, MONGO_DB_NAME
+from datetime import datetime
+from typing import AsyncIterator
+
+from pymongo import AsyncMongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+from config import (
+    MONGO_URI, MONGO_DB_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, SCHEDULER_SHARDS,
+)
+from utils.metrics import MongoCommandListener
 import logging
 
 logger = logging.getLogger(__name__)
 
-# создаём клиент MongoDB с учётом часового пояса (tz_aware=True)
-client = MongoClient(MONGO_URI, tz_aware=True)
+# асинхронный клиент MongoDB; создаётся при первом обращении, закрывается в close_db()
+_client: AsyncMongoClient | None = None
+
+
+def get_client() -> AsyncMongoClient:
+    """
+    Возвращает асинхронный клиент MongoDB, создавая его при первом обращении.
+
+    Клиент держит пул соединений (MONGO_MAX_POOL_SIZE) и учитывает часовой пояс (tz_aware=True).
+    Само подключение устанавливается лениво — при первой операции или в init_db().
+    """
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(
+            MONGO_URI,
+            tz_aware=True,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            # длительность и ошибки каждой команды попадают в метрики
+            event_listeners=[MongoCommandListener()],
+        )
+    return _client
+
+
+def get_db() -> AsyncDatabase:
+    """Возвращает базу данных по имени из конфигурации."""
+    return get_client()[MONGO_DB_NAME]
+
+
+def subscriptions_collection() -> AsyncCollection:
+    """Коллекция для хранения подписок пользователей."""
+    return get_db()["subscriptions"]
+
+
+def user_settings_collection() -> AsyncCollection:
+    """Коллекция для хранения настроек пользователей."""
+    return get_db()["user_settings"]
+
+
+def fsm_states_collection() -> AsyncCollection:
+    """Состояния диалогов пользователей (FSM aiogram)."""
+    return get_db()["fsm_states"]
+
+
+def scheduler_leases_collection() -> AsyncCollection:
+    """Аренды шардов планировщика: какой экземпляр бота рассылает подписки шарда."""
+    return get_db()["scheduler_leases"]
+
+
+def scheduler_instances_collection() -> AsyncCollection:
+    """Живые экземпляры планировщика (обновляют запись, пока работают)."""
+    return get_db()["scheduler_instances"]
+
+
+async def ensure_indexes():
+    """
+    Создаёт индексы, необходимые для работы бота (операция идемпотентна).
+    """
+    # индекс по времени следующей рассылки: планировщик выбирает только «созревшие» подписки
+    await subscriptions_collection().create_index("next_due")
+    # то же в пределах шардов, которые арендует экземпляр планировщика
+    await subscriptions_collection().create_index([("shard", 1), ("next_due", 1)])
+    # брошенные диалоги удаляются сами по истечении срока
+    await fsm_states_collection().create_index("exp", expireAfterSeconds=0)
+    # записи упавших экземпляров удаляются сами
+    await scheduler_instances_collection().create_index("expires_at", expireAfterSeconds=0)
+    # поиск подписок и настроек конкретного пользователя
+    await subscriptions_collection().create_index("user_id")
+    await user_settings_collection().create_index("user_id")
+    logger.info("Индексы коллекций проверены")
+
+
+async def init_db():
+    """
+    Подключается к MongoDB и готовит коллекции к работе.
+    Вызывается один раз при старте бота.
+    """
+    await get_client().admin.command("ping")
+    await ensure_indexes()
+    updated = await backfill_subscription_shards(SCHEDULER_SHARDS)
+    if updated:
+        logger.info(f"Номер шарда проставлен {updated} подпискам")
+    logger.info(f"Подключение к базе данных '{MONGO_DB_NAME}' установлено. Коллекции: subscriptions, user_settings")
+
+
+async def close_db():
+    """
+    Закрывает клиент MongoDB и все соединения пула.
+    Вызывается при остановке бота.
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+        logger.info("Соединение с базой данных закрыто")
+
+
+# === Настройки пользователей ===
+
+
+async def find_user_settings(user_id: int) -> dict | None:
+    """Возвращает документ настроек пользователя или None, если настроек нет."""
+    return await user_settings_collection().find_one({"user_id": user_id})
+
+
+async def upsert_user_settings(user_id: int, fields: dict) -> dict:
+    """Обновляет (или создаёт) настройки пользователя и возвращает документ после изменения."""
+    return await user_settings_collection().find_one_and_update(
+        {"user_id": user_id},
+        {"$set": fields},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+# === Подписки ===
+
+
+def due_filter(until: datetime) -> dict:
+    """
+    Возвращает фильтр подписок, созревших к моменту until.
+    next_due=None — подписки, созданные до появления поля: они считаются созревшими.
+    """
+    return {"$or": [{"next_due": {"$lte": until}}, {"next_due": None}]}
+
+
+async def insert_subscription(subscription: dict):
+    """Сохраняет новую подписку."""
+    await subscriptions_collection().insert_one(subscription)
+
+
+async def find_user_subscriptions(user_id: int) -> list[dict]:
+    """Возвращает все подписки пользователя."""
+    return await subscriptions_collection().find({"user_id": user_id}).to_list(None)
+
+
+def shard_filter(shards) -> dict:
+    """Фильтр подписок по шардам; shards=None — без ограничения."""
+    return {} if shards is None else {"shard": {"$in": sorted(shards)}}
+
+
+async def backfill_subscription_shards(shards: int) -> int:
+    """
+    Проставляет shard = user_id % shards подпискам, у которых его нет или он посчитан
+    для другого числа шардов. Возвращает число обновлённых подписок.
+    """
+    result = await subscriptions_collection().update_many(
+        {"$expr": {"$ne": ["$shard", {"$mod": ["$user_id", shards]}]}},
+        [{"$set": {"shard": {"$mod": ["$user_id", shards]}}}],
+    )
+    return result.modified_count
+
+
+async def iter_due_subscriptions(until: datetime, projection: dict, batch_size: int, shards=None) -> AsyncIterator[dict]:
+    """
+    Потоково возвращает подписки, созревшие к моменту until.
+
+    Параметры:
+        until (datetime): граница по next_due
+        projection (dict): какие поля читать
+        batch_size (int): сколько документов получать с сервера за один запрос
+        shards: номера шардов, подписки которых нужны; None — все
+    """
+    cursor = subscriptions_collection().find(
+        {**due_filter(until), **shard_filter(shards)}, projection
+    ).batch_size(batch_size)
+    try:
+        async for doc in cursor:
+            yield doc
+    finally:
+        await cursor.close()
+
+
+async def iter_area_subscriptions(areas: list[str], projection: dict, batch_size: int) -> AsyncIterator[dict]:
+    """
+    Потоково возвращает подписки с регионом из списка areas.
+
+    Параметры:
+        areas (list[str]): id регионов
+        projection (dict): какие поля читать
+        batch_size (int): сколько документов получать с сервера за один запрос
+    """
+    cursor = subscriptions_collection().find({"area": {"$in": areas}}, projection).batch_size(batch_size)
+    try:
+        async for doc in cursor:
+            yield doc
+    finally:
+        await cursor.close()
+
+
+async def find_due_subscriptions(sub_ids: list, now: datetime, projection: dict, shards=None) -> list[dict]:
+    """
+    Возвращает подписки из списка sub_ids, которые по-прежнему созрели к моменту now.
+    Удалённые и перенесённые подписки, а также подписки из шардов вне shards, отбрасываются.
+    """
+    return await subscriptions_collection().find(
+        {"_id": {"$in": sub_ids}, **due_filter(now), **shard_filter(shards)},
+        projection,
+    ).to_list(None)
+
+
+async def bulk_update_subscriptions(updates: dict):
+    """
+    Применяет обновления к нескольким подпискам одним неупорядоченным bulk_write.
+    updates: {_id подписки: документ обновления ($set/$inc)}.
+    Ошибка одной операции не останавливает остальные.
+    """
+    if not updates:
+        return
+    await subscriptions_collection().bulk_write(
+        [UpdateOne({"_id": sub_id}, update) for sub_id, update in updates.items()],
+        ordered=False,
+    )
+
+
+# === Аренды шардов планировщика ===
+
+
+async def heartbeat_instance(instance_id: str, now: datetime, expires_at: datetime):
+    """Отмечает экземпляр планировщика живым до expires_at."""
+    await scheduler_instances_collection().update_one(
+        {"_id": instance_id},
+        {"$set": {"heartbeat_at": now, "expires_at": expires_at}},
+        upsert=True,
+    )
+
+
+async def count_live_instances(now: datetime) -> int:
+    """Сколько экземпляров планировщика отметились и ещё не просрочены."""
+    return await scheduler_instances_collection().count_documents({"expires_at": {"$gt": now}})
+
+
+async def remove_instance(instance_id: str):
+    await scheduler_instances_collection().delete_one({"_id": instance_id})
+
+
+async def renew_leases(owner: str, now: datetime, expires_at: datetime) -> set[int]:
+    """Продлевает ещё не истёкшие аренды владельца и возвращает номера его шардов."""
+    await scheduler_leases_collection().update_many(
+        {"owner": owner, "expires_at": {"$gt": now}},
+        {"$set": {"heartbeat_at": now, "expires_at": expires_at}},
+    )
+    docs = await scheduler_leases_collection().find(
+        {"owner": owner, "expires_at": {"$gt": now}}, {"_id": 1}
+    ).to_list(None)
+    return {doc["_id"] for doc in docs}
+
+
+async def find_taken_shards(now: datetime) -> set[int]:
+    """Номера шардов с действующей арендой (любого владельца)."""
+    docs = await scheduler_leases_collection().find({"expires_at": {"$gt": now}}, {"_id": 1}).to_list(None)
+    return {doc["_id"] for doc in docs}
 
-# выбираем базу данных по имени из конфигурации
-db = client[MONGO_DB_NAME]
 
-# коллекция для хранения подписок пользователей
-subscriptions_collection = db["subscriptions"]
+async def try_acquire_lease(shard: int, owner: str, now: datetime, expires_at: datetime) -> bool:
+    """
+    Пытается взять аренду шарда: свободного, истёкшего или уже своего.
+    Если шард занят другим экземпляром, upsert упирается в уникальный _id — возвращается False.
+    """
+    try:
+        await scheduler_leases_collection().update_one(
+            {"_id": shard, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"owner": owner, "heartbeat_at": now, "expires_at": expires_at}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False
 
-# коллекция для хранения настроек пользователей
-user_settings_collection = db["user_settings"]
 
-logger.info(f"Подключение к базе данных '{MONGO_DB_NAME}' установлено. Коллекции: subscriptions, user_settings")
+async def release_leases(owner: str, shards=None):
+    """Отдаёт аренды владельца (все или только shards), чтобы их сразу могли забрать другие."""
+    query = {"owner": owner}
+    if shards is not None:
+        query["_id"] = {"$in": sorted(shards)}
+    await scheduler_leases_collection().delete_many(query)
@@ -1,10 +1,9 @@
-import subprocess
-import tempfile
 from aiogram import types, F, Router
 from aiogram.fsm.context import FSMContext
 
 from models import PylintStates
 from logger import logger  # централизованный логгер приложения
+from utils.pylint_pool import pylint_pool, PylintBusyError
 
 router = Router()
 
@@ -23,7 +22,7 @@ async def start_pylint(message: types.Message, state: FSMContext):
 async def check_code(message: types.Message, state: FSMContext):
     """
     Обработчик текста от пользователя в состоянии ожидания кода.
-    Извлекает код из сообщения, сохраняет во временный файл, запускает pylint и отправляет результат.
+    Извлекает код из сообщения, проверяет его pylint в пуле процессов и отправляет результат.
     """
     code = message.text
     user_id = message.from_user.id
@@ -36,26 +35,12 @@ async def check_code(message: types.Message, state: FSMContext):
     logger.debug(f"[Pylint] Получен код от пользователя {user_id}:\n{code[:100]}...")  # логируем первые 100 символов
 
     try:
-        # Создаём временный файл с расширением .py (для корректной работы pylint)
-        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=True) as temp_file:
-            temp_file.write(code)    # записываем код в файл
-            temp_file.flush()        # принудительно записываем содержимое на диск
-
-            logger.debug(f"[Pylint] Запускаю pylint на временном файле: {temp_file.name}")
-
-            # Запускаем pylint с нужными флагами:
-            # --disable=all отключает все проверки
-            # --enable=E,F,W,C,R включает ошибки, фатальные, предупреждения, соглашения и рефакторинги
-            result = subprocess.run(
-                ["pylint", temp_file.name, "--disable=all", "--enable=E,F,W,C,R"],
-                stdout=subprocess.PIPE,   # перенаправляем stdout
-                stderr=subprocess.PIPE,   # перенаправляем stderr
-                text=True,                # получаем вывод в виде строки
-                timeout=10                # ограничиваем время выполнения
-            )
+        # Проверка выполняется в одном из заранее запущенных процессов пула;
+        # одинаковый код повторно не проверяется — результат берётся из кэша
+        output = await pylint_pool.check(code)
 
         # Обрезаем и очищаем вывод от лишнего
-        output = result.stdout.strip()
+        output = output.strip()
 
         if not output:
             # Если нет вывода — значит, ошибок не найдено
@@ -70,7 +55,15 @@ async def check_code(message: types.Message, state: FSMContext):
             await message.answer(f"<pre>{output}</pre>", parse_mode="HTML")
             logger.info(f"[Pylint] У пользователя {user_id} найдены замечания")
 
-    except subprocess.TimeoutExpired:
+    except PylintBusyError:
+        # все процессы заняты и очередь заполнена
+        logger.warning(f"[Pylint] Очередь проверок переполнена, пользователь {user_id}")
+        await message.answer("Сейчас проверяется слишком много кода. Попробуй через минуту.")
+    except MemoryError:
+        # проверка упёрлась в ограничение памяти
+        logger.warning(f"[Pylint] Превышен лимит памяти при проверке кода у пользователя {user_id}")
+        await message.answer("Код слишком большой для анализа. Попробуй сократить его.")
+    except TimeoutError:
         # pylint не успел выполниться за отведённое время
         logger.warning(f"[Pylint] Таймаут при проверке кода у пользователя {user_id}")
         await message.answer("Превышено время ожидания анализа. Попробуй сократить код.")
@@ -1,8 +1,9 @@
 from aiogram import types, F, Router
 from aiogram.fsm.context import FSMContext
 from models import SubscriptionForm
-from db import subscriptions_collection
+from db import find_user_subscriptions
 from utils.save_subsctiption import save_subscription
+from utils.frequency import frequency_minutes
 
 router = Router()
 
@@ -38,14 +39,14 @@ async def handle_level(message: types.Message, state: FSMContext):
 async def handle_area(message: types.Message, state: FSMContext):
     if message.text.strip().lower() != "/skip":
         await state.update_data(area=message.text.strip())
-    await message.answer("Как часто присылать вакансии? (daily/weekly):")
+    await message.answer("Как часто присылать вакансии? (daily/weekly или интервал, например: 12h, 3d):")
     await state.set_state(SubscriptionForm.frequency)
 
 @router.message(SubscriptionForm.frequency)
 async def handle_frequency(message: types.Message, state: FSMContext):
     freq = message.text.strip().lower()
-    if freq not in ("daily", "weekly"):
-        await message.answer("Пожалуйста, введи 'daily' или 'weekly'.")
+    if frequency_minutes(freq) is None:
+        await message.answer("Пожалуйста, введи 'daily', 'weekly' или интервал не меньше часа, например: 12h, 3d.")
         return
 
     await state.update_data(frequency=freq, last_sent=None)
@@ -67,7 +68,7 @@ async def confirm_subscription(message: types.Message, state: FSMContext):
         "frequency": data.get("frequency"),
         "last_sent": None
     }
-    save_subscription(subscription)
+    await save_subscription(subscription)
     await message.answer("Подписка успешно сохранена ✅")
     await state.clear()
 
@@ -79,7 +80,7 @@ async def cancel_subscription(message: types.Message, state: FSMContext):
 @router.message(F.text == "/show_subscriptions")
 async def show_subscriptions(message: types.Message):
     user_id = message.from_user.id
-    subs = list(subscriptions_collection.find({"user_id": user_id}))
+    subs = await find_user_subscriptions(user_id)
     if not subs:
         await message.answer("У тебя пока нет подписок.")
         return
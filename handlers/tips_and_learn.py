@@ -2,18 +2,22 @@ from aiogram import types, F, Router
 from aiogram.fsm.context import FSMContext
 import json
 import random
+from functools import cache
+from pathlib import Path
 from logger import logger  # централизованный логгер приложения
 from utils.user_settings_db import get_user_settings
 
 router = Router()
 
-# Загружаем обучающие данные из JSON-файла при старте бота
-with open("learning_data.json", encoding="utf-8") as f:
-    learning_data = json.load(f)
+# файл с советами и ресурсами лежит в корне проекта — ищем его от пакета, а не от текущего каталога
+LEARNING_DATA_PATH = Path(__file__).resolve().parent.parent / "learning_data.json"
 
-# Извлекаем советы по Python и ресурсы для обучения по уровням
-PYTHON_TIPS = learning_data["tips"]
-LEARNING_RESOURCES = learning_data["resources"]
+
+@cache
+def learning_data() -> dict:
+    """Советы по Python и ресурсы для обучения по уровням; файл читается при первой команде /tip или /learn."""
+    with open(LEARNING_DATA_PATH, encoding="utf-8") as f:
+        return json.load(f)
 
 
 @router.message(F.text == "/tip")
@@ -31,7 +35,7 @@ async def send_python_tip(message: types.Message, state: FSMContext):
     logger.info(f"[Tip] Пользователь {user_id} запросил совет для уровня '{level}'")
 
     # Получаем список советов для данного уровня, выбираем случайный
-    tips_for_level = PYTHON_TIPS.get(level, [])
+    tips_for_level = learning_data()["tips"].get(level, [])
     if not tips_for_level:
         # Если для уровня нет советов — логируем предупреждение и уведомляем пользователя
         logger.warning(f"[Tip] Для уровня '{level}' нет советов.")
@@ -58,7 +62,7 @@ async def send_learning_resources(message: types.Message, state: FSMContext):
     logger.info(f"[Learn] Пользователь {user_id} запросил ресурсы для уровня '{level}'")
 
     # Получаем ресурсы для данного уровня
-    resources_for_level = LEARNING_RESOURCES.get(level, [])
+    resources_for_level = learning_data()["resources"].get(level, [])
     if not resources_for_level:
         # Если для уровня нет ресурсов — логируем предупреждение и сообщаем пользователю
         logger.warning(f"[Learn] Для уровня '{level}' нет ресурсов.")
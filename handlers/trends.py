@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timezone
+from html import escape
+
+from aiogram import types, F, Router
+
+from config import CITIES, ARCHIVE_TRENDS_DAYS
+from utils.vacancy_archive import vacancy_archive, CityTrend
+from logger import logger  # централизованный логгер
+
+# Роутер для команды /trends
+router = Router()
+
+
+def format_delta(current: int, previous: int) -> str:
+    """Изменение к прошлой неделе в процентах."""
+    if not previous:
+        return "новые" if current else "—"
+    change = round((current - previous) / previous * 100)
+    return f"{change:+d}%" if change else "без изменений"
+
+
+def format_trend(trend: CityTrend) -> str:
+    city = CITIES.get(str(trend.area), f"регион {trend.area}")
+    line = (
+        f"<b>{escape(city)}</b>: {trend.this_week} за неделю ({format_delta(trend.this_week, trend.prev_week)}), "
+        f"всего {trend.total}"
+    )
+    if trend.salary:
+        p25, p50, p75 = (round(v / 1000) for v in trend.salary)
+        line += f"\nзарплата: медиана {p50} тыс. ₽, от {p25} до {p75} тыс. ₽ (25–75%)"
+    return line
+
+
+@router.message(F.text.startswith("/trends"))
+async def trends(message: types.Message):
+    """
+    Обрабатывает команду /trends [ключевые слова].
+
+    Параметры:
+        message (types.Message): Сообщение от пользователя.
+
+    Логика:
+        - Считает по локальному архиву вакансий (без запросов к hh.ru и MongoDB) число вакансий
+          с ключевыми словами по регионам за неделю, изменение к прошлой неделе и перцентили зарплат.
+        - Без ключевых слов — статистика по всем вакансиям архива.
+    """
+    parts = message.text.split(maxsplit=1)
+    keyword = parts[1].strip() if len(parts) > 1 else None
+    logger.info(f"[TRENDS] Пользователь {message.from_user.id} запросил тренды: {keyword}")
+
+    try:
+        # недописанные вакансии тоже должны попасть в статистику
+        await vacancy_archive.flush()
+        result = await asyncio.to_thread(vacancy_archive.trends, keyword, datetime.now(timezone.utc))
+    except Exception as e:
+        logger.exception(f"[TRENDS] Ошибка при расчёте трендов: {e}")
+        await message.answer("Произошла ошибка при расчёте статистики 😢")
+        return
+
+    title = f"по запросу «{escape(keyword)}»" if keyword else "по всем вакансиям"
+    if not result:
+        await message.answer(f"В архиве пока нет вакансий {title}.")
+        return
+    lines = [f"📈 Тренды {title} за {ARCHIVE_TRENDS_DAYS} дн.\n"]
+    lines.extend(format_trend(trend) for trend in result)
+    await message.answer("\n\n".join(lines))
@@ -1,8 +1,13 @@
+from html import escape
+
 from aiogram import types, F, Router
 from aiogram.fsm.context import FSMContext
 
-from utils.hh_api import fetch_vacancies
-from config import CITIES
+from utils.hh_api import cached_fetch_vacancies, search_url
+from utils.digest import send_digest, more_button
+from utils.resilience import CircuitOpenError
+from utils.vacancy_archive import vacancy_archive
+from config import CITIES, DIGEST_MODE, DIGEST_MORE_BUTTON, ARCHIVE_ENABLED
 from utils.user_settings_db import get_user_settings
 from logger import logger  # централизованный логгер
 
@@ -44,12 +49,15 @@ async def vacancies(message: types.Message, state: FSMContext):
     logger.debug(f"[VACANCIES] Ключевые слова: {keywords}, уровень: {display_level}, город: {city_name}")
 
     await message.answer(
-        f"Ищу вакансии по запросу: <b>{keywords}</b>, уровень: <b>{display_level}</b>, город: <b>{city_name}</b>…"
+        f"Ищу вакансии по запросу: <b>{escape(keywords)}</b>, уровень: <b>{display_level}</b>, город: <b>{city_name}</b>…"
     )
 
     try:
-        # Получаем вакансии с помощью API
-        items = fetch_vacancies(keywords=keywords, level=level, area=city_id)
+        # Получаем вакансии с помощью API (популярные запросы — из кэша); в архив — только свежие ответы
+        items = await cached_fetch_vacancies(
+            keywords=keywords, level=level, area=city_id,
+            on_fetch=vacancy_archive.add if ARCHIVE_ENABLED else None,
+        )
 
         if not items:
             await message.answer("Вакансий не найдено.")
@@ -58,8 +66,18 @@ async def vacancies(message: types.Message, state: FSMContext):
 
         logger.info(f"[VACANCIES] Найдено {len(items)} вакансий для {user_id}")
 
-        for v in items:
-            await message.answer(f"<b>{v['name']}</b>\n{v['alternate_url']}")
+        if DIGEST_MODE:
+            # весь список — одним сообщением, полная выдача доступна по кнопке
+            markup = more_button(search_url(level, keywords, city_id)) if DIGEST_MORE_BUTTON else None
+            await send_digest(message.bot, message.chat.id, items, reply_markup=markup)
+        else:
+            for v in items:
+                await message.answer(f"<b>{escape(v['name'])}</b>\n{v['alternate_url']}")
+    except CircuitOpenError as e:
+        # hh.ru перегружен или недоступен — не ждём, сразу отвечаем пользователю
+        logger.warning(f"[VACANCIES] hh.ru недоступен для пользователя {user_id}: {e}")
+        minutes = max(1, round(e.retry_in / 60))
+        await message.answer(f"hh.ru сейчас не отвечает. Попробуйте через {minutes} мин.")
     except Exception as e:
         logger.exception(f"[VACANCIES] Ошибка при получении вакансий для пользователя {user_id}: {e}")
         await message.answer("Произошла ошибка при получении вакансий 😢")
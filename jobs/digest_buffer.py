@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from config import DIGEST_ACCUMULATE_FROM_MINUTES, DIGEST_HARVEST_MINUTES, DIGEST_BUFFER_SIZE
+from jobs.matcher import newest_first
+from jobs.sent_ids import sent_id_set, vacancy_key
+
+# поля вакансии, которые хранятся в буфере подписки (всё, что нужно для строки дайджеста)
+BUFFER_FIELDS = ("id", "name", "alternate_url", "published_at", "salary")
+
+
+def accumulates(interval: int | None) -> bool:
+    """Копит ли подписка с таким интервалом (в минутах) вакансии между рассылками."""
+    return interval is not None and interval >= DIGEST_ACCUMULATE_FROM_MINUTES
+
+
+def compact_vacancy(v: dict) -> dict:
+    """Оставляет от вакансии только поля для дайджеста; от работодателя — одно название."""
+    item = {field: v.get(field) for field in BUFFER_FIELDS}
+    employer = (v.get("employer") or {}).get("name")
+    if employer:
+        item["employer"] = {"name": employer}
+    return item
+
+
+def merge_buffer(buffer: list[dict] | None, items: list[dict], sent_ids: bytes | None,
+                 limit: int = DIGEST_BUFFER_SIZE) -> list[dict]:
+    """
+    Добавляет к буферу подписки новые вакансии.
+
+    Параметры:
+        buffer (list[dict] | None): Текущий буфер подписки (поле buffer).
+        items (list[dict]): Вакансии из окна подписки, собранные с прошлого пополнения.
+        sent_ids (bytes | None): Уже отправленные подписке вакансии (поле sent_ids) — в буфер не попадают.
+        limit (int): Размер буфера.
+
+    Возвращает:
+        list[dict]: Не больше limit самых свежих вакансий без повторов, новые сначала.
+    """
+    already_sent = sent_id_set(sent_ids)
+    merged: dict[str, dict] = {}
+    for v in [*(buffer or []), *items]:
+        if vacancy_key(v["id"]) not in already_sent:
+            merged[str(v["id"])] = v
+    return [compact_vacancy(v) for v in newest_first(list(merged.values()))[:limit]]
+
+
+def next_harvest_after(last_sent: datetime | None, interval: int, moment: datetime) -> datetime:
+    """Следующее пополнение буфера — через DIGEST_HARVEST_MINUTES, но не позже срока рассылки."""
+    harvest_at = moment + timedelta(minutes=DIGEST_HARVEST_MINUTES)
+    if last_sent is None:
+        return harvest_at
+    return min(harvest_at, last_sent + timedelta(minutes=interval))
@@ -0,0 +1,88 @@
+import heapq
+import itertools
+from datetime import datetime, timezone
+
+
+def to_minute(moment: datetime) -> int:
+    """
+    Переводит момент времени в номер минуты от начала эпохи (с округлением вверх),
+    чтобы подписки, созревающие в одну минуту, обрабатывались одной пачкой.
+    """
+    seconds = moment.timestamp()
+    return int(-(-seconds // 60))
+
+
+def from_minute(minute: int) -> datetime:
+    """Обратное преобразование: номер минуты -> datetime в UTC."""
+    return datetime.fromtimestamp(minute * 60, tz=timezone.utc)
+
+
+class DueQueue:
+    """
+    Очередь подписок по времени следующей рассылки с разрешением в одну минуту.
+
+    Реализована как min-куча (минута, порядок добавления, id подписки).
+    Повторное добавление той же подписки заменяет её время: старая запись в куче
+    остаётся, но при извлечении пропускается (ленивое удаление).
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[int, int, object]] = []
+        self._due: dict[object, int] = {}  # id подписки -> актуальная минута рассылки
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, sub_id) -> bool:
+        return sub_id in self._due
+
+    def push(self, sub_id, due: datetime):
+        """
+        Добавляет подписку или переносит её на новое время.
+
+        Параметры:
+            sub_id: идентификатор подписки (_id в MongoDB)
+            due (datetime): время, начиная с которого подписку пора обработать
+        """
+        minute = to_minute(due)
+        if self._due.get(sub_id) == minute:
+            return
+        self._due[sub_id] = minute
+        heapq.heappush(self._heap, (minute, next(self._seq), sub_id))
+
+    def discard(self, sub_id):
+        """Убирает подписку из очереди (запись в куче будет пропущена при извлечении)."""
+        self._due.pop(sub_id, None)
+
+    def pop_due(self, now: datetime) -> list:
+        """
+        Извлекает все подписки, время которых наступило.
+
+        Параметры:
+            now (datetime): текущий момент
+
+        Возвращает:
+            list: id созревших подписок в порядке их времени рассылки
+        """
+        # минута m означает «созреет не позже m*60»: извлекаем только наступившие целиком,
+        # иначе при пробуждении посреди минуты подписки, созревающие позже now в ту же минуту,
+        # были бы извлечены, но отброшены повторной проверкой next_due <= now
+        limit = int(now.timestamp() // 60)
+        result = []
+        while self._heap and self._heap[0][0] <= limit:
+            minute, _, sub_id = heapq.heappop(self._heap)
+            # запись устарела: подписку перенесли или удалили
+            if self._due.get(sub_id) != minute:
+                continue
+            del self._due[sub_id]
+            result.append(sub_id)
+        return result
+
+    def next_at(self) -> datetime | None:
+        """Возвращает время ближайшей подписки в очереди или None, если очередь пуста."""
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return from_minute(self._heap[0][0])
@@ -0,0 +1,110 @@
+import asyncio
+import math
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from config import SCHEDULER_SHARDS, SCHEDULER_LEASE_SECONDS, SCHEDULER_LEASE_RENEW_SECONDS
+from db import (
+    heartbeat_instance, count_live_instances, remove_instance, renew_leases, find_taken_shards,
+    try_acquire_lease, release_leases,
+)
+from logger import logger
+
+
+def shard_of(user_id: int, shards: int = SCHEDULER_SHARDS) -> int:
+    """Номер шарда подписки: все подписки пользователя попадают в один шард."""
+    return int(user_id) % shards
+
+
+def make_instance_id() -> str:
+    """Уникальный идентификатор экземпляра бота: хост, pid и случайный суффикс."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class ShardLeases:
+    """
+    Распределение шардов подписок между экземплярами планировщика через аренды в MongoDB.
+
+    Каждый экземпляр раз в renew_seconds:
+        - отмечается живым (scheduler_instances) и продлевает свои аренды;
+        - считает справедливую долю: ceil(shards / число живых экземпляров);
+        - лишние шарды отдаёт, недостающие забирает из свободных или истёкших.
+
+    Если экземпляр упал, его аренды истекают через lease_seconds и их забирают остальные.
+    Рассылает экземпляр только подписки из шардов в owned.
+    """
+
+    def __init__(self, instance_id: str | None = None, shards: int = SCHEDULER_SHARDS,
+                 lease_seconds: int = SCHEDULER_LEASE_SECONDS, renew_seconds: int = SCHEDULER_LEASE_RENEW_SECONDS):
+        self.instance_id = instance_id or make_instance_id()
+        self.shards = shards
+        self.lease_seconds = lease_seconds
+        self.renew_seconds = renew_seconds
+        self.owned: frozenset[int] = frozenset()
+        self.valid_until: datetime | None = None  # до какого момента аренды гарантированно наши
+        # выставляется, когда набор шардов изменился — планировщику пора перечитать очередь
+        self.changed = asyncio.Event()
+
+    async def rebalance(self):
+        """Продлевает аренды и приводит число своих шардов к справедливой доле."""
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+
+        await heartbeat_instance(self.instance_id, now, expires_at)
+        owned = await renew_leases(self.instance_id, now, expires_at)
+        fair = math.ceil(self.shards / max(await count_live_instances(now), 1))
+
+        if len(owned) > fair:
+            extra = sorted(owned)[fair:]
+            await release_leases(self.instance_id, extra)
+            owned -= set(extra)
+        elif len(owned) < fair:
+            taken = await find_taken_shards(now)
+            free = [s for s in range(self.shards) if s not in taken]
+            # случайный порядок — чтобы одновременно стартовавшие экземпляры меньше толкались за одни шарды
+            random.shuffle(free)
+            for shard in free:
+                if len(owned) >= fair:
+                    break
+                if await try_acquire_lease(shard, self.instance_id, now, expires_at):
+                    owned.add(shard)
+
+        owned = frozenset(owned)
+        self.valid_until = expires_at
+        if owned != self.owned:
+            gained, lost = owned - self.owned, self.owned - owned
+            logger.info(
+                f"[LEASES] {self.instance_id}: шардов {len(owned)}/{self.shards} "
+                f"(+{len(gained)}, -{len(lost)}), доля {fair}"
+            )
+            self.owned = owned
+            self.changed.set()
+
+    def active(self, now: datetime) -> frozenset[int]:
+        """
+        Шарды, которые можно рассылать в момент now. Если аренды давно не продлевались
+        (например, MongoDB недоступна), они могли уже перейти к другим — тогда ничего.
+        """
+        if self.valid_until is None or now >= self.valid_until:
+            return frozenset()
+        return self.owned
+
+    async def run(self):
+        """Фоновое продление аренд; ошибки MongoDB не останавливают цикл."""
+        while True:
+            try:
+                await self.rebalance()
+            except Exception as e:
+                logger.exception(f"[LEASES] Ошибка при продлении аренд: {e}")
+            await asyncio.sleep(self.renew_seconds)
+
+    async def release(self):
+        """Отдаёт все аренды при остановке, чтобы шарды сразу перешли к другим экземплярам."""
+        self.owned = frozenset()
+        self.valid_until = None
+        await release_leases(self.instance_id)
+        await remove_instance(self.instance_id)
+        logger.info(f"[LEASES] {self.instance_id}: аренды освобождены")
@@ -0,0 +1,266 @@
+import asyncio
+import math
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from config import (
+    CITIES, MATCHER_POLL_SECONDS, MATCHER_INDEX_REFRESH_SECONDS, MATCHER_INITIAL_WINDOW_MINUTES,
+    MATCHER_PENDING_LIMIT, MATCHER_MAX_PAGES, SCHEDULER_BATCH_SIZE, ARCHIVE_ENABLED,
+)
+from db import iter_area_subscriptions
+from utils.hh_api import iter_vacancies, normalize_query, parse_published_at
+from utils.resilience import CircuitOpenError
+from utils.vacancy_archive import vacancy_archive
+from utils.tokens import tokenize, vacancy_tokens
+from logger import logger
+
+# какой опыт работы на hh.ru соответствует уровню подписки
+LEVEL_EXPERIENCE = {
+    "junior": {"noExperience", "between1And3"},
+    "middle": {"between1And3", "between3And6"},
+    "senior": {"between3And6", "moreThan6"},
+}
+
+# поля вакансии, которые нужны для отправки; остальное в памяти не держим
+PENDING_FIELDS = ("id", "name", "alternate_url", "published_at")
+
+
+def newest_first(items: list[dict]) -> list[dict]:
+    """Сортирует вакансии по дате публикации, новые сначала."""
+    epoch = datetime.min.replace(tzinfo=timezone.utc)
+    return sorted(items, key=lambda v: parse_published_at(v) or epoch, reverse=True)
+
+
+class IndexedSubscription(NamedTuple):
+    tokens: frozenset[str]  # все токены ключевых слов — должны встретиться в вакансии
+    anchor: str             # токен, под которым подписка лежит в индексе ("" — без ключевых слов)
+    level: str
+    area: str
+    since: datetime         # с какого момента публикации вакансии сопоставляются с подпиской
+
+
+class SubscriptionIndex:
+    """
+    Инвертированный индекс подписок: регион -> токен-«якорь» -> id подписок.
+
+    Каждая подписка кладётся в индекс один раз, под самым длинным (обычно самым
+    редким) из своих токенов. Для вакансии кандидатами становятся подписки,
+    чей якорь встречается в её токенах, после чего у кандидатов проверяются
+    остальные токены и уровень. Стоимость сопоставления зависит от числа токенов
+    вакансии и кандидатов, а не от общего числа подписок.
+    """
+
+    def __init__(self):
+        self._anchors: dict[str, dict[str, set]] = {}
+        self._subs: dict[object, IndexedSubscription] = {}
+
+    def __len__(self) -> int:
+        return len(self._subs)
+
+    def get(self, sub_id) -> IndexedSubscription | None:
+        return self._subs.get(sub_id)
+
+    def add(self, sub_id, keywords: str, level: str, area: str, since: datetime):
+        """Добавляет (или заменяет) подписку в индексе."""
+        self.remove(sub_id)
+        tokens = frozenset(tokenize(keywords))
+        anchor = max(tokens, key=len) if tokens else ""
+        self._subs[sub_id] = IndexedSubscription(tokens, anchor, level, area, since)
+        self._anchors.setdefault(area, {}).setdefault(anchor, set()).add(sub_id)
+
+    def remove(self, sub_id):
+        """Убирает подписку из индекса."""
+        entry = self._subs.pop(sub_id, None)
+        if entry is None:
+            return
+        postings = self._anchors[entry.area][entry.anchor]
+        postings.discard(sub_id)
+        if not postings:
+            del self._anchors[entry.area][entry.anchor]
+
+    def match(self, area: str, tokens: set[str], experience: str | None) -> list:
+        """
+        Возвращает id подписок региона, которым подходит вакансия.
+
+        Параметры:
+            area (str): регион вакансии
+            tokens (set[str]): токены вакансии
+            experience (str | None): id требуемого опыта на hh.ru
+
+        Возвращает:
+            list: id подходящих подписок
+        """
+        anchors = self._anchors.get(area)
+        if not anchors:
+            return []
+        result = []
+        for anchor in tokens | {""}:
+            for sub_id in anchors.get(anchor, ()):
+                entry = self._subs[sub_id]
+                if not entry.tokens <= tokens:
+                    continue
+                # уровень совпадает, если он упомянут в тексте или соответствует требуемому опыту
+                if entry.level and entry.level not in tokens and experience not in LEVEL_EXPERIENCE.get(entry.level, ()):
+                    continue
+                result.append(sub_id)
+        return result
+
+
+class VacancyMatcher:
+    """
+    Режим локального сопоставления для планировщика.
+
+    Для каждого региона из config.CITIES периодически забирает поток новых вакансий
+    (один сбор на регион, без текста запроса) и сопоставляет каждую вакансию
+    со всеми подписками через SubscriptionIndex. Совпадения копятся в памяти
+    по подписке (не больше MATCHER_PENDING_LIMIT) до её ближайшей рассылки.
+
+    Подписки, которые индекс не покрывает (другой регион, подписка добавлена недавно,
+    бот только что перезапущен), планировщик обслуживает обычными запросами к hh.ru.
+    """
+
+    def __init__(self):
+        self.index = SubscriptionIndex()
+        self.areas = list(CITIES)
+        self._pending: dict[object, list[dict]] = {}
+        self._last_poll: dict[str, datetime] = {}     # регион -> момент последнего успешного сбора
+        self._covered_since: dict[str, datetime] = {} # регион -> с какого момента публикации вакансии собираются
+        self._seen: dict[str, dict[str, datetime]] = {}  # регион -> id вакансии -> дата публикации
+
+    def _poll_since(self, area: str, now: datetime) -> datetime:
+        """Начало окна следующего сбора по региону."""
+        return self._last_poll.get(area) or now - timedelta(minutes=MATCHER_INITIAL_WINDOW_MINUTES)
+
+    async def rebuild_index(self):
+        """
+        Перестраивает индекс по подпискам из MongoDB.
+        Подписки, уже бывшие в индексе, сохраняют свою границу покрытия.
+        """
+        now = datetime.now(timezone.utc)
+        index = SubscriptionIndex()
+        projection = {"_id": 1, "keywords": 1, "level": 1, "area": 1}
+        async for sub in iter_area_subscriptions(self.areas, projection, SCHEDULER_BATCH_SIZE):
+            keywords, level, area = normalize_query(sub.get("keywords"), sub.get("level"), sub.get("area"))
+            old = self.index.get(sub["_id"])
+            # новая подписка увидит только вакансии из следующего сбора по её региону
+            since = old.since if old and old.area == area else self._poll_since(area, now)
+            index.add(sub["_id"], keywords, level, area, since)
+
+        # совпадения удалённых подписок больше не нужны
+        for sub_id in [s for s in self._pending if index.get(s) is None]:
+            del self._pending[sub_id]
+        self.index = index
+        logger.info(f"[MATCHER] Индекс перестроен: {len(index)} подписок")
+
+    async def poll_area(self, area: str):
+        """
+        Забирает вакансии региона, опубликованные с момента прошлого сбора,
+        и раскладывает их по подходящим подпискам.
+        """
+        now = datetime.now(timezone.utc)
+        since = self._poll_since(area, now)
+        # запас в минуту: вакансии на границе окна отсекаются по id
+        minutes = math.ceil((now - since).total_seconds() / 60) + 1
+        seen = self._seen.setdefault(area, {})
+        matched = 0
+        fresh = []
+        stats = {}
+        oldest = now
+
+        async for item in iter_vacancies(area=area, since_minutes_ago=minutes, max_pages=MATCHER_MAX_PAGES, stats=stats):
+            published_at = parse_published_at(item) or now
+            oldest = min(oldest, published_at)
+            if item["id"] in seen:
+                continue
+            seen[item["id"]] = published_at
+            fresh.append(item)
+
+            experience = (item.get("experience") or {}).get("id")
+            for sub_id in self.index.match(area, vacancy_tokens(item), experience):
+                if published_at < self.index.get(sub_id).since:
+                    continue
+                pending = self._pending.setdefault(sub_id, [])
+                pending.append({field: item.get(field) for field in PENDING_FIELDS})
+                matched += 1
+                # при переполнении оставляем самые свежие вакансии (обрезка пачкой — амортизированно дёшево)
+                if len(pending) > 2 * MATCHER_PENDING_LIMIT:
+                    self._pending[sub_id] = newest_first(pending)[:MATCHER_PENDING_LIMIT]
+
+        # забываем id вакансий, которые уже не попадут в окно сбора
+        for vacancy_id in [v for v, p in seen.items() if p < since - timedelta(minutes=1)]:
+            del seen[vacancy_id]
+
+        self._last_poll[area] = now
+        if stats.get("truncated"):
+            # выдача обрезана (MATCHER_MAX_PAGES или предел глубины hh.ru): вакансии старше самой старой
+            # полученной не собраны, и подписки с более ранним окном должны уходить в обычные запросы
+            covered = max(self._covered_since.get(area, oldest), oldest)
+            logger.warning(f"[MATCHER] Регион {area}: выдача обрезана ({stats['found']} вакансий), "
+                           f"вакансии собраны начиная с {covered}")
+            self._covered_since[area] = covered
+        else:
+            self._covered_since.setdefault(area, since)
+        if ARCHIVE_ENABLED:
+            vacancy_archive.add(fresh)
+        logger.info(f"[MATCHER] Регион {area}: новых вакансий {len(fresh)}, совпадений {matched}")
+
+    def covers(self, sub: dict, since: datetime | None) -> bool:
+        """
+        Проверяет, собраны ли для подписки все вакансии, начиная с момента since.
+
+        Параметры:
+            sub (dict): подписка (нужен _id)
+            since (datetime | None): начало окна подписки; None — без ограничения, индекс такое не покрывает
+        """
+        entry = self.index.get(sub["_id"])
+        if entry is None or since is None or entry.area not in self._last_poll:
+            return False
+        return max(self._covered_since[entry.area], entry.since) <= since
+
+    def peek(self, sub: dict) -> tuple[list[dict], datetime]:
+        """
+        Возвращает накопленные для подписки вакансии, не забирая их:
+        после удачной рассылки их нужно убрать через forget().
+
+        Возвращает:
+            tuple[list[dict], datetime]: вакансии (новые сначала) и момент, на который они актуальны
+        """
+        entry = self.index.get(sub["_id"])
+        items = newest_first(self._pending.get(sub["_id"], []))[:MATCHER_PENDING_LIMIT]
+        return items, self._last_poll[entry.area]
+
+    def forget(self, sub: dict, items: list[dict]):
+        """Убирает из накопленного вакансии, полученные через peek(); собранные после него остаются."""
+        pending = self._pending.get(sub["_id"])
+        if pending is None:
+            return
+        handled = {v["id"] for v in items}
+        rest = [v for v in pending if v["id"] not in handled]
+        if rest:
+            self._pending[sub["_id"]] = rest
+        else:
+            del self._pending[sub["_id"]]
+
+    async def run(self):
+        """Фоновый цикл: перестраивает индекс и собирает вакансии по всем регионам."""
+        next_rebuild = datetime.now(timezone.utc)
+        while True:
+            now = datetime.now(timezone.utc)
+            if now >= next_rebuild:
+                try:
+                    await self.rebuild_index()
+                except Exception as e:
+                    logger.exception(f"[MATCHER] Ошибка при построении индекса: {e}")
+                next_rebuild = now + timedelta(seconds=MATCHER_INDEX_REFRESH_SECONDS)
+
+            for area in self.areas:
+                try:
+                    await self.poll_area(area)
+                except CircuitOpenError as e:
+                    # hh.ru недоступен — остальные регионы опрашивать бессмысленно
+                    logger.warning(f"[MATCHER] Сбор вакансий отложен: {e}")
+                    break
+                except Exception as e:
+                    logger.exception(f"[MATCHER] Ошибка при сборе вакансий региона {area}: {e}")
+
+            await asyncio.sleep(MATCHER_POLL_SECONDS)
@@ -1,17 +1,53 @@
 import asyncio
-from datetime import datetime, timezone
-from db import subscriptions_collection
-from utils.hh_api import fetch_vacancies
+from html import escape
+from datetime import datetime, timedelta, timezone
+from config import (
+    SCHEDULER_MAX_ITEMS, SCHEDULER_FETCH_PER_PAGE, SCHEDULER_HARVEST_MAX_PAGES, SCHEDULER_BATCH_SIZE, SCHEDULER_REFILL_SECONDS,
+    SCHEDULER_HORIZON_SECONDS, SCHEDULER_FETCH_REUSE_SECONDS, SCHEDULER_MODE, SENT_IDS_LIMIT,
+    SENT_IDS_MAX_AGE_DAYS, DIGEST_MODE, DIGEST_MORE_BUTTON, SCHEDULER_RETRY_MINUTES, ARCHIVE_ENABLED, DIGEST_HARVEST_MINUTES,
+)
+from db import iter_due_subscriptions, find_due_subscriptions
+from jobs.due_queue import DueQueue
+from utils.frequency import FREQUENCY_MINUTES, frequency_minutes
+from jobs.leases import ShardLeases
+from jobs.write_back import SubscriptionWriteBack
+from jobs.digest_buffer import accumulates, merge_buffer, next_harvest_after
+from jobs.matcher import VacancyMatcher
+from jobs.sent_ids import remember_sent_ids, sent_id_set, vacancy_key
+from utils.hh_api import iter_vacancies, normalize_query, parse_published_at, search_url
+from utils.resilience import CircuitOpenError
+from utils.vacancy_archive import vacancy_archive
+from utils.digest import send_digest, more_button
 from aiogram import Bot
+from utils.telegram_limiter import send_priority, PRIORITY_BROADCAST
+from utils.metrics import (
+    SCHEDULER_RUN_SECONDS, SCHEDULER_DUE, SCHEDULER_QUEUE_SIZE, SCHEDULER_LAG_SECONDS, SCHEDULER_LAST_RUN,
+)
 from logger import logger
 
+# поля подписки, которые нужны планировщику; остальное из MongoDB не читаем
+SUBSCRIPTION_PROJECTION = {
+    "_id": 1,
+    "user_id": 1,
+    "keywords": 1,
+    "level": 1,
+    "area": 1,
+    "frequency": 1,
+    "last_sent": 1,
+    "next_due": 1,
+    "sent_ids": 1,
+    "send_failures": 1,
+    "buffer": 1,
+    "harvested_at": 1,
+}
+
 # функция проверяет, нужно ли пропустить отправку подписки на основе частоты и времени последней отправки
 def should_skip_sending(frequency: str, last_sent: datetime | None, now: datetime) -> tuple[bool, int]:
     """
     Определяет, следует ли пропустить отправку вакансий по частоте рассылки.
 
     Параметры:
-        frequency (str): Частота рассылки ("daily", "weekly").
+        frequency (str): Частота рассылки ("daily", "weekly" или произвольный интервал вида "12h").
         last_sent (datetime | None): Время последней отправки вакансий.
         now (datetime): Текущее время.
 
@@ -20,15 +56,10 @@ def should_skip_sending(frequency: str, last_sent: datetime | None, now: datetim
             - Нужно ли пропустить отправку (True/False).
             - Количество минут, прошедших с последней отправки или дефолтное значение для частоты.
     """
-
-    # словарь: сколько минут соответствует каждой частоте
-    delta_minutes = {
-        "daily": 24 * 60,
-        "weekly": 7 * 24 * 60
-    }
+    interval = frequency_minutes(frequency)
 
     # если частота не указана корректно, логируем и возвращаем, что не надо пропускать, но не фильтруем по времени
-    if frequency not in delta_minutes:
+    if interval is None:
         logger.warning(f"[SUB] Неизвестная частота: {frequency}")
         return False, 0
 
@@ -37,82 +68,437 @@ def should_skip_sending(frequency: str, last_sent: datetime | None, now: datetim
         # считаем, сколько минут прошло
         elapsed = (now - last_sent).total_seconds() / 60
         # если прошло меньше, чем надо — пропускаем
-        if elapsed < delta_minutes[frequency]:
+        if elapsed < interval:
             return True, int(elapsed)
         # если прошло достаточно — не пропускаем
         return False, int(elapsed)
     else:
         # если ещё не было отправок — не пропускаем
-        return False, delta_minutes[frequency]
+        return False, interval
+
+
+def next_due_after(frequency: str, moment: datetime) -> datetime:
+    """
+    Вычисляет время следующей рассылки по подписке.
+
+    Параметры:
+        frequency (str): Частота рассылки; нераспознанная частота считается ежедневной.
+        moment (datetime): Момент, от которого отсчитывается интервал.
+
+    Возвращает:
+        datetime: Время, начиная с которого подписка снова попадёт в рассылку.
+    """
+    minutes = frequency_minutes(frequency) or FREQUENCY_MINUTES["daily"]
+    return moment + timedelta(minutes=minutes)
+
+
+def retry_due_after(frequency: str, failures: int, moment: datetime) -> datetime:
+    """
+    Время повторной попытки после неудачной отправки: SCHEDULER_RETRY_MINUTES,
+    удваивающиеся с каждой неудачей подряд, но не реже обычного интервала подписки.
+    """
+    minutes = frequency_minutes(frequency) or FREQUENCY_MINUTES["daily"]
+    backoff = SCHEDULER_RETRY_MINUTES * 2 ** min(max(failures - 1, 0), 16)
+    return moment + timedelta(minutes=min(backoff, minutes))
+
+
+def subscription_query_key(sub: dict) -> tuple[str, str, str]:
+    """
+    Возвращает ключ поискового запроса подписки.
+    Подписки с одинаковым ключом обслуживаются одним запросом к hh.ru.
+
+    Параметры:
+        sub (dict): Подписка пользователя.
+
+    Возвращает:
+        tuple[str, str, str]: Нормализованные (keywords, level, area).
+    """
+    return normalize_query(sub.get("keywords"), sub.get("level"), sub.get("area"))
+
+
+def filter_items_since(items: list[dict], since: datetime | None) -> list[dict]:
+    """
+    Оставляет только вакансии, опубликованные не раньше указанного момента.
+
+    Параметры:
+        items (list[dict]): Вакансии, полученные от hh.ru.
+        since (datetime | None): Начало окна подписки; None — без фильтрации.
+
+    Возвращает:
+        list[dict]: Отфильтрованные вакансии в исходном порядке.
+    """
+    if since is None:
+        return list(items)
+    result = []
+    for v in items:
+        published_at = parse_published_at(v)
+        # вакансии без даты не отбрасываем — hh.ru уже отфильтровал их по date_from
+        if published_at is None or published_at >= since:
+            result.append(v)
+    return result
 
-async def send_vacancies_for_subscription(bot: Bot, sub: dict):
+
+def select_items(sub: dict, items: list[dict], since: datetime | None) -> list[dict]:
+    """
+    Отбирает вакансии для конкретной подписки: из её окна, ещё не отправленные, не больше SCHEDULER_MAX_ITEMS.
+
+    Параметры:
+        sub (dict): Подписка пользователя (нужно поле sent_ids).
+        items (list[dict]): Вакансии-кандидаты, новые сначала.
+        since (datetime | None): Начало окна подписки; None — без фильтрации по времени.
+
+    Возвращает:
+        list[dict]: Вакансии к отправке.
+    """
+    already_sent = sent_id_set(sub.get("sent_ids"))
+    return [
+        v for v in filter_items_since(items, since)
+        if vacancy_key(v["id"]) not in already_sent
+    ][:SCHEDULER_MAX_ITEMS]
+
+
+async def send_vacancies_for_subscription(bot: Bot, sub: dict, items: list[dict], now: datetime, fetched_at: datetime,
+                                          writer: SubscriptionWriteBack, next_due: datetime | None = None,
+                                          extra_fields: dict | None = None) -> bool:
     """
-    Выполняет отправку новых вакансий пользователю по его подписке.
+    Отправляет пользователю вакансии по его подписке и обновляет время последней отправки.
 
     Параметры:
         bot (Bot): Экземпляр Telegram-бота.
         sub (dict): Подписка пользователя, содержащая user_id, параметры фильтрации, частоту, дату последней отправки и др.
+        items (list[dict]): Вакансии, уже отобранные для окна этой подписки.
+        now (datetime): Момент обработки подписки, от него отсчитывается next_due.
+        fetched_at (datetime): Момент, на который актуальны вакансии; записывается в last_sent.
+        writer (SubscriptionWriteBack): Накопитель изменений подписок — пишет в MongoDB пачками.
+        next_due (datetime | None): Время следующей обработки; None — через интервал подписки.
+        extra_fields (dict | None): Дополнительные поля подписки, которые записываются вместе
+            с next_due, если отправка не оборвалась (например, очищенный буфер дайджеста).
 
     Логика:
-        - Проверяет, нужно ли пропустить рассылку в зависимости от частоты и времени.
-        - Получает актуальные вакансии.
-        - Отправляет сообщения пользователю, если вакансии найдены.
-        - Обновляет в базе данных время последней отправки.
+        - Отправляет вакансии пользователю, если они найдены: дайджестом (DIGEST_MODE) или по одной.
+        - Передаёт в writer время последней и следующей отправки и список отправленных id.
+        - Если отправка оборвалась на середине, всё равно сохраняет id уже отправленных вакансий,
+          чтобы при повторе они не пришли пользователю ещё раз, увеличивает счётчик неудач
+          send_failures и откладывает повтор с растущей паузой.
         - Логирует шаги и возможные ошибки.
+
+    Возвращает:
+        bool: False, если отправка не удалась (вакансии нужно будет отправить повторно).
     """
-    # получаем user_id и текущий момент времени (в UTC)
     user_id = sub["user_id"]
-    now = datetime.now(timezone.utc)
-
-    # достаём параметры из подписки
-    last_sent = sub.get("last_sent")
-    frequency = sub.get("frequency")
-    keywords = sub.get("keywords")
-    level = sub.get("level")
-    area = sub.get("area")
-
-    # логируем текущие параметры подписки
-    logger.info(f"[SUB {user_id}] Проверка: frequency={frequency}, last_sent={last_sent}, now={now}")
-
-    # решаем, нужно ли пропускать отправку
-    skip, minutes_since_last = should_skip_sending(frequency, last_sent, now)
-    if skip:
-        logger.info(f"[SUB {user_id}] Интервал ещё не прошёл ({minutes_since_last:.0f} мин)")
-        return
+    next_due = next_due or next_due_after(sub.get("frequency"), now)
+    extra_fields = extra_fields or {}
+    sent_now = []
 
     try:
-        # получаем список новых вакансий
-        items = fetch_vacancies(
-            level=level,
-            keywords=keywords,
-            area=area,
-            per_page=5,  # ограничим до 5 вакансий
-            since_minutes_ago=minutes_since_last  # фильтруем по времени
-        )
-
-        # если вакансий нет — логируем и выходим
+        # если вакансий нет — переносим следующую проверку и выходим;
+        # last_sent не трогаем, чтобы в следующий раз окно поиска покрыло и этот период
         if not items:
             logger.info(f"[SUB {user_id}] Новых вакансий нет.")
-            return
+            await writer.update(sub["_id"], {"next_due": next_due, **extra_fields})
+            return True
 
         # логируем количество найденных вакансий
         logger.info(f"[SUB {user_id}] Найдено {len(items)} вакансий.")
-        # отправляем каждую вакансию пользователю
-        for v in items:
-            await bot.send_message(user_id, f"<b>{v['name']}</b>\n{v['alternate_url']}")
-
-        # обновляем поле last_sent в БД, чтобы не слать повторно
-        subscriptions_collection.update_one(
-            {"_id": sub["_id"]},
-            {"$set": {"last_sent": now}}
-        )
-        logger.info(f"[SUB {user_id}] Подписка обновлена: last_sent={now}")
+        if DIGEST_MODE:
+            # все вакансии подписки — одним сообщением (или несколькими, если не влезают в лимит)
+            header = f"Новые вакансии по подписке <b>{escape(sub.get('keywords') or '')}</b>:"
+            markup = None
+            if DIGEST_MORE_BUTTON:
+                markup = more_button(search_url(sub.get("level"), sub.get("keywords"), sub.get("area")))
+            await send_digest(bot, user_id, items, header, reply_markup=markup, sent=sent_now)
+        else:
+            # отправляем каждую вакансию пользователю
+            for v in items:
+                await bot.send_message(user_id, f"<b>{escape(v['name'])}</b>\n{v['alternate_url']}")
+                sent_now.append(v["id"])
 
     # если произошла ошибка — логируем с трейсом
     except Exception as e:
         logger.exception(f"[SUB {user_id}] Ошибка при рассылке: {e}")
+        failures = (sub.get("send_failures") or 0) + 1
+        fields = {"next_due": retry_due_after(sub.get("frequency"), failures, now)}
+        # запоминаем хотя бы то, что успели отправить
+        if sent_now:
+            fields["sent_ids"] = remember_sent_ids(sub.get("sent_ids"), sent_now, now, SENT_IDS_LIMIT, SENT_IDS_MAX_AGE_DAYS)
+        await writer.update(sub["_id"], fields, inc={"send_failures": 1}, durable=bool(sent_now))
+        return False
+
+    # обновляем last_sent, next_due и отправленные id, чтобы не слать повторно
+    fields = {
+        **extra_fields,
+        "last_sent": fetched_at,
+        "next_due": next_due,
+        "sent_ids": remember_sent_ids(sub.get("sent_ids"), sent_now, now, SENT_IDS_LIMIT, SENT_IDS_MAX_AGE_DAYS),
+    }
+    if sub.get("send_failures"):
+        fields["send_failures"] = 0
+    # вакансии уже доставлены — записываем сразу, чтобы после падения процесса не отправить их снова
+    await writer.update(sub["_id"], fields, durable=True)
+    logger.info(f"[SUB {user_id}] Подписка обновлена: last_sent={fetched_at}, next_due={next_due}")
+    return True
+
+
+async def serve_subscription(bot: Bot, sub: dict, items: list[dict], since: datetime | None, now: datetime,
+                             fetched_at: datetime, writer: SubscriptionWriteBack, harvest: bool = False) -> bool:
+    """
+    Раздаёт подписке вакансии, собранные для её окна.
+
+    Параметры:
+        bot (Bot): Экземпляр Telegram-бота.
+        sub (dict): Подписка пользователя.
+        items (list[dict]): Вакансии-кандидаты, новые сначала.
+        since (datetime | None): Начало окна подписки; None — без фильтрации по времени.
+        now (datetime): Момент обработки.
+        fetched_at (datetime): Момент, на который актуальны вакансии.
+        writer (SubscriptionWriteBack): Накопитель изменений подписок пачки.
+        harvest (bool): Срок рассылки ещё не наступил — только пополнить буфер подписки.
+
+    Логика:
+        - Подписки с коротким интервалом сразу получают до SCHEDULER_MAX_ITEMS новых вакансий.
+        - Подписки с интервалом от DIGEST_ACCUMULATE_FROM_MINUTES (например, weekly) раз в
+          DIGEST_HARVEST_MINUTES попадают в общие запросы вместе с ежедневными и копят в поле buffer
+          до DIGEST_BUFFER_SIZE самых свежих вакансий. В срок рассылки дайджест собирается из буфера
+          и вакансий с последнего пополнения — без запроса к hh.ru за весь интервал, где в выдачу
+          попала бы лишь малая часть вакансий.
+
+    Возвращает:
+        bool: False, если отправка не удалась.
+    """
+    interval = frequency_minutes(sub.get("frequency"))
+    if not accumulates(interval):
+        return await send_vacancies_for_subscription(bot, sub, select_items(sub, items, since), now, fetched_at, writer)
+
+    buffer = merge_buffer(sub.get("buffer"), filter_items_since(items, since), sub.get("sent_ids"))
+    if harvest:
+        logger.debug(f"[SUB {sub['user_id']}] Буфер дайджеста пополнен: {len(buffer)} вакансий")
+        await writer.update(sub["_id"], {
+            "buffer": buffer,
+            "harvested_at": fetched_at,
+            "next_due": next_harvest_after(sub.get("last_sent"), interval, now),
+        })
+        return True
+
+    next_harvest = now + timedelta(minutes=DIGEST_HARVEST_MINUTES)
+    if not buffer:
+        # пустой дайджест не отправляем, но срок следующего всё равно сдвигаем на интервал подписки:
+        # окно пополнения считается от harvested_at, так что last_sent здесь задаёт только периодичность
+        logger.info(f"[SUB {sub['user_id']}] Новых вакансий для дайджеста нет.")
+        await writer.update(sub["_id"], {
+            "last_sent": fetched_at,
+            "next_due": next_harvest,
+            "buffer": [],
+            "harvested_at": fetched_at,
+        })
+        return True
 
-# фоновая задача, которая запускается раз в сутки
+    # после рассылки буфер начинает копиться заново — со следующего пополнения
+    return await send_vacancies_for_subscription(
+        bot, sub, buffer, now, fetched_at, writer,
+        next_due=next_harvest,
+        extra_fields={"buffer": [], "harvested_at": fetched_at},
+    )
+
+
+async def send_vacancies_for_group(
+    bot: Bot,
+    key: tuple[str, str, str],
+    group: list[tuple[dict, int, bool]],
+    now: datetime,
+    fetched: dict[tuple[str, str, str], tuple[datetime, datetime | None, list[dict]]],
+    writer: SubscriptionWriteBack,
+):
+    """
+    Обслуживает группу подписок с одинаковым поисковым запросом:
+    один раз собирает выдачу hh.ru (до SCHEDULER_HARVEST_MAX_PAGES страниц)
+    и раздаёт результат всем подписчикам группы.
+
+    Параметры:
+        bot (Bot): Экземпляр Telegram-бота.
+        key (tuple[str, str, str]): Нормализованный ключ запроса (keywords, level, area).
+        group (list[tuple[dict, int, bool]]): Подписки группы, число минут с их последней отправки
+            (или пополнения буфера) и признак пополнения буфера вместо рассылки.
+        now (datetime): Момент обработки.
+        fetched (dict): Недавние ответы hh.ru: ключ -> (момент запроса, начало окна или None, вакансии).
+        writer (SubscriptionWriteBack): Накопитель изменений подписок пачки.
+
+    Логика:
+        - Окно запроса берётся по самой «старой» подписке группы, чтобы покрыть всех.
+        - Если недавно уже выполнялся запрос с таким ключом и достаточным окном — hh.ru не вызывается.
+        - Каждый подписчик получает только вакансии из своего окна last_sent,
+          которые ещё не отправлялись ему раньше.
+    """
+    keywords, level, area = key
+    minutes = [m for _, m, _ in group]
+    # 0 минут означает «без фильтра по времени» — тогда и общий запрос делаем без него
+    since_minutes_ago = 0 if 0 in minutes else max(minutes)
+    since = now - timedelta(minutes=since_minutes_ago) if since_minutes_ago else None
+
+    cached = fetched.get(key)
+    # окно без фильтра (None) покрывает любое другое
+    if cached and (cached[1] is None or (since is not None and cached[1] <= since)):
+        fetched_at, _, items = cached
+        logger.debug(f"[GROUP {key}] Используем ответ hh.ru от {fetched_at} для {len(group)} подписок")
+    else:
+        logger.info(f"[GROUP {key}] Запрос вакансий для {len(group)} подписок, окно {since_minutes_ago} мин")
+        try:
+            items = [
+                v async for v in iter_vacancies(
+                    level=level or None,
+                    keywords=keywords or None,
+                    area=area or None,
+                    since_minutes_ago=since_minutes_ago,  # фильтруем по времени
+                    per_page=SCHEDULER_FETCH_PER_PAGE,
+                    max_pages=SCHEDULER_HARVEST_MAX_PAGES,
+                )
+            ]
+        except CircuitOpenError as e:
+            # подписки остаются созревшими и попадут в очередь при следующей подгрузке
+            logger.warning(f"[GROUP {key}] Запрос к hh.ru пропущен: {e}")
+            return
+        except Exception as e:
+            logger.exception(f"[GROUP {key}] Ошибка при получении вакансий: {e}")
+            return
+        fetched_at = now
+        fetched[key] = (fetched_at, since, items)
+        if ARCHIVE_ENABLED:
+            vacancy_archive.add(items)
+
+    for sub, minutes_since_last, harvest in group:
+        sub_since = now - timedelta(minutes=minutes_since_last) if minutes_since_last else None
+        await serve_subscription(bot, sub, items, sub_since, now, fetched_at, writer, harvest)
+
+
+async def process_batch(bot: Bot, batch: list[dict], now: datetime, fetched: dict, matcher: VacancyMatcher | None = None):
+    """
+    Обрабатывает пачку подписок, прочитанных из MongoDB.
+
+    Параметры:
+        bot (Bot): Экземпляр Telegram-бота.
+        batch (list[dict]): Подписки пачки (только поля SUBSCRIPTION_PROJECTION).
+        now (datetime): Момент обработки.
+        fetched (dict): Недавние ответы hh.ru, которые можно переиспользовать.
+        matcher (VacancyMatcher | None): Локальное сопоставление (режим "index"); подписки,
+            которые оно покрывает, обслуживаются без запросов к hh.ru.
+
+    Изменения подписок копятся в SubscriptionWriteBack и записываются неупорядоченным bulk_write.
+    После каждой доставленной рассылки (last_sent, sent_ids) накопленное записывается сразу, поэтому
+    аварийное падение процесса не приводит к повторной отправке. Некритичные изменения (next_due
+    подписок без новых вакансий, буфер дайджеста) уходят вместе с ними, в конце пачки или по
+    SCHEDULER_WRITE_BATCH подписок / раз в SCHEDULER_WRITE_FLUSH_SECONDS; при падении такие
+    подписки просто будут проверены ещё раз.
+    """
+    writer = SubscriptionWriteBack()
+    try:
+        await _process_batch(bot, batch, now, fetched, matcher, writer)
+    finally:
+        await writer.flush()
+
+
+async def _process_batch(bot: Bot, batch: list[dict], now: datetime, fetched: dict,
+                         matcher: VacancyMatcher | None, writer: SubscriptionWriteBack):
+    # группируем подписки, которым пора отправлять, по ключу запроса
+    groups: dict[tuple[str, str, str], list[tuple[dict, int, bool]]] = {}
+    matched = 0
+    for sub in batch:
+        user_id = sub.get("user_id")
+        frequency = sub.get("frequency")
+        last_sent = sub.get("last_sent")
+        logger.debug(f"[SUB {user_id}] Проверка: frequency={frequency}, last_sent={last_sent}, now={now}")
+
+        # решаем, нужно ли пропускать отправку (подписки без next_due, созданные до его появления)
+        skip, minutes_since_last = should_skip_sending(frequency, last_sent, now)
+        accumulating = accumulates(frequency_minutes(frequency))
+        # подписка с длинным интервалом между рассылками пополняет буфер дайджеста
+        harvest = skip and accumulating
+        if skip and not harvest:
+            logger.debug(f"[SUB {user_id}] Интервал ещё не прошёл ({minutes_since_last:.0f} мин)")
+            # проставляем next_due, чтобы подписка больше не попадала в выборку раньше времени
+            await writer.update(sub["_id"], {"next_due": next_due_after(frequency, last_sent)})
+            continue
+
+        # вакансии до прошлого пополнения уже в буфере — окно начинается с него
+        if accumulating and sub.get("harvested_at"):
+            minutes_since_last = max(int((now - sub["harvested_at"]).total_seconds() / 60), 1)
+
+        # подписка покрыта локальным сопоставлением — отправляем накопленное без запроса к hh.ru
+        since = now - timedelta(minutes=minutes_since_last) if minutes_since_last else None
+        if matcher is not None and matcher.covers(sub, since):
+            items, fetched_at = matcher.peek(sub)
+            # при неудачной отправке вакансии остаются в индексе до следующей попытки
+            if await serve_subscription(bot, sub, items, since, now, fetched_at, writer, harvest):
+                matcher.forget(sub, items)
+            matched += 1
+            continue
+
+        groups.setdefault(subscription_query_key(sub), []).append((sub, minutes_since_last, harvest))
+
+    logger.info(
+        f"В пачке к рассылке {sum(len(g) for g in groups.values()) + matched} подписок: "
+        f"из локального индекса {matched}, уникальных запросов к hh.ru: {len(groups)}"
+    )
+
+    # проходим по каждому уникальному запросу
+    for key, group in groups.items():
+        try:
+            await send_vacancies_for_group(bot, key, group, now, fetched, writer)
+        except Exception as e:
+            # если при обработке группы возникла ошибка — логируем
+            logger.exception(f"Ошибка при обработке группы подписок {key}: {e}")
+
+
+async def refill_queue(queue: DueQueue, until: datetime, shards=None) -> int:
+    """
+    Подгружает в очередь подписки, которые созреют не позже until.
+
+    Читается только _id и next_due, поэтому очередь остаётся компактной,
+    а полные документы загружаются лишь в момент обработки.
+
+    Параметры:
+        queue (DueQueue): Очередь планировщика.
+        until (datetime): Граница горизонта подгрузки.
+        shards: Шарды, арендованные этим экземпляром; None — все подписки.
+
+    Возвращает:
+        int: Сколько подписок прочитано из MongoDB.
+    """
+    count = 0
+    async for doc in iter_due_subscriptions(until, {"_id": 1, "next_due": 1}, SCHEDULER_BATCH_SIZE, shards):
+        # подписки без next_due обрабатываем сразу
+        queue.push(doc["_id"], doc.get("next_due") or datetime.now(timezone.utc))
+        count += 1
+    return count
+
+
+async def process_due(bot: Bot, sub_ids: list, now: datetime, fetched: dict, matcher: VacancyMatcher | None = None,
+                      shards=None) -> int:
+    """
+    Загружает созревшие подписки пачками и обрабатывает их.
+
+    Параметры:
+        bot (Bot): Экземпляр Telegram-бота.
+        sub_ids (list): id подписок, извлечённых из очереди.
+        now (datetime): Момент обработки.
+        fetched (dict): Недавние ответы hh.ru, которые можно переиспользовать.
+        matcher (VacancyMatcher | None): Локальное сопоставление (режим "index").
+        shards: Шарды, арендованные этим экземпляром; None — все подписки.
+
+    Возвращает:
+        int: Сколько подписок обработано.
+    """
+    total = 0
+    for i in range(0, len(sub_ids), SCHEDULER_BATCH_SIZE):
+        chunk = sub_ids[i:i + SCHEDULER_BATCH_SIZE]
+        # повторно проверяем next_due (подписка могла быть удалена или перенесена)
+        # и шард (аренду могли забрать, пока подписка ждала в очереди)
+        batch = await find_due_subscriptions(chunk, now, SUBSCRIPTION_PROJECTION, shards)
+        if batch:
+            await process_batch(bot, batch, now, fetched, matcher)
+            total += len(batch)
+    return total
+
+
+# фоновая задача рассылки, управляемая временем next_due каждой подписки
 async def daily_job_sending(bot: Bot):
     """
     Запускает фоновую задачу рассылки вакансий по всем активным подпискам.
@@ -121,27 +507,97 @@ async def daily_job_sending(bot: Bot):
         bot (Bot): Экземпляр Telegram-бота.
 
     Логика:
-        - Проходит по всем подпискам.
-        - Пытается отправить подходящие вакансии каждому пользователю.
-        - Повторяет цикл каждые 24 часа.
+        - Раз в SCHEDULER_REFILL_SECONDS подгружает из MongoDB подписки, созревающие
+          в ближайшие SCHEDULER_HORIZON_SECONDS, в очередь с разрешением в одну минуту.
+        - Спит до ближайшего next_due в очереди и обрабатывает созревшие подписки пачками.
+        - Внутри пачки группирует подписки по нормализованному поисковому запросу
+          и обращается к hh.ru один раз на уникальный запрос (недавние ответы переиспользуются).
+        - В режиме SCHEDULER_MODE="index" параллельно работает VacancyMatcher: новые вакансии
+          по регионам из CITIES сопоставляются с подписками локально, а запросы к hh.ru
+          остаются только для подписок, которые индекс не покрывает.
+        - Расписание хранится в MongoDB (next_due), поэтому переживает перезапуск бота.
+        - Подписки поделены на SCHEDULER_SHARDS шардов по user_id; экземпляр рассылает только
+          шарды, аренду которых держит (ShardLeases), поэтому несколько копий бота делят работу
+          без повторных отправок. При смене набора шардов очередь сразу перечитывается.
         - Логирует выполнение и ошибки.
     """
+    # плановая рассылка уступает очередь ответам на команды пользователей
+    send_priority.set(PRIORITY_BROADCAST)
+
+    queue = DueQueue()
+    # недавние ответы hh.ru: ключ -> (момент запроса, начало окна, вакансии)
+    fetched: dict[tuple[str, str, str], tuple[datetime, datetime | None, list[dict]]] = {}
+    next_refill = datetime.now(timezone.utc)
+    logger.info(f"Запуск фоновой задачи рассылки (режим {SCHEDULER_MODE})...")
+
+    matcher = None
+    matcher_task = None
+    if SCHEDULER_MODE == "index":
+        matcher = VacancyMatcher()
+        matcher_task = asyncio.create_task(matcher.run())
+
+    leases = ShardLeases()
+    leases_task = asyncio.create_task(leases.run())
+    try:
+        await _scheduler_loop(bot, queue, fetched, matcher, leases, next_refill)
+    finally:
+        leases_task.cancel()
+        if matcher_task is not None:
+            matcher_task.cancel()
+        try:
+            await leases.release()
+        except Exception as e:
+            logger.exception(f"[SCHEDULER] Не удалось освободить аренды шардов: {e}")
+
+
+async def _scheduler_loop(bot: Bot, queue: DueQueue, fetched: dict, matcher: VacancyMatcher | None,
+                          leases: ShardLeases, next_refill: datetime):
+    """Основной цикл daily_job_sending: подгрузка очереди, обработка созревших подписок, сон."""
+    loop = asyncio.get_running_loop()
     while True:
-        # логируем начало задачи
-        logger.info("Запуск фоновой задачи рассылки...")
+        now = datetime.now(timezone.utc)
+        shards = leases.active(now)
+
+        # шарды перешли к нам или от нас — перечитываем очередь, не дожидаясь плановой подгрузки
+        if leases.changed.is_set():
+            leases.changed.clear()
+            next_refill = now
+
+        if now >= next_refill:
+            try:
+                loaded = await refill_queue(queue, now + timedelta(seconds=SCHEDULER_HORIZON_SECONDS), shards)
+                logger.info(f"[SCHEDULER] Подгружено {loaded} подписок, в очереди {len(queue)}")
+            except Exception as e:
+                logger.exception(f"[SCHEDULER] Ошибка при подгрузке подписок: {e}")
+            next_refill = now + timedelta(seconds=SCHEDULER_REFILL_SECONDS)
 
-        # достаём все подписки из базы
-        subscriptions = list(subscriptions_collection.find({}))
+        oldest_due = queue.next_at()
+        due_ids = queue.pop_due(now)
+        SCHEDULER_DUE.set(len(due_ids))
+        SCHEDULER_QUEUE_SIZE.set(len(queue))
+        if due_ids:
+            SCHEDULER_LAG_SECONDS.set(max((now - oldest_due).total_seconds(), 0))
+            # забываем ответы hh.ru, которые уже слишком стары для переиспользования
+            reuse_from = now - timedelta(seconds=SCHEDULER_FETCH_REUSE_SECONDS)
+            for key in [k for k, v in fetched.items() if v[0] < reuse_from]:
+                del fetched[key]
 
-        # проходим по каждой подписке
-        for sub in subscriptions:
+            started = loop.time()
             try:
-                # отправляем вакансии для каждой подписки
-                await send_vacancies_for_subscription(bot, sub)
+                total = await process_due(bot, due_ids, now, fetched, matcher, shards)
+                logger.info(f"[SCHEDULER] Обработано {total} подписок, в очереди осталось {len(queue)}")
             except Exception as e:
-                # если при обработке подписки возникла ошибка — логируем
-                logger.exception(f"Ошибка при обработке подписки: user_id={sub.get('user_id')}")
+                logger.exception(f"[SCHEDULER] Ошибка при обработке подписок: {e}")
+            SCHEDULER_RUN_SECONDS.observe(loop.time() - started)
+            SCHEDULER_LAST_RUN.set(datetime.now(timezone.utc).timestamp())
 
-        # логируем паузу и ждём 24 часа
-        logger.info("Ожидание следующего запуска через 24 часа...")
-        await asyncio.sleep(60 * 60 * 24)
+        # спим до ближайшей подписки в очереди или до следующей подгрузки
+        wake_at = next_refill
+        next_at = queue.next_at()
+        if next_at is not None and next_at < wake_at:
+            wake_at = next_at
+        delay = (wake_at - datetime.now(timezone.utc)).total_seconds()
+        try:
+            await asyncio.wait_for(leases.changed.wait(), timeout=max(delay, 1))
+        except asyncio.TimeoutError:
+            pass
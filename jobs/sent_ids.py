@@ -0,0 +1,67 @@
+import struct
+import zlib
+from datetime import datetime
+
+from bson import Binary
+
+# одна запись — id вакансии (uint32) и день отправки (uint16, дни от начала эпохи): 6 байт
+RECORD = struct.Struct("<IH")
+
+
+def vacancy_key(vacancy_id) -> int:
+    """
+    Приводит id вакансии к 32-битному числу.
+    id hh.ru — десятичные числа; всё остальное хэшируется crc32.
+    """
+    text = str(vacancy_id)
+    if text.isdigit() and int(text) < 2 ** 32:
+        return int(text)
+    return zlib.crc32(text.encode())
+
+
+def epoch_day(moment: datetime) -> int:
+    """Номер дня от начала эпохи."""
+    return int(moment.timestamp() // 86400)
+
+
+def decode_sent_ids(blob: bytes | None) -> list[tuple[int, int]]:
+    """Распаковывает сохранённые записи (id, день) из поля подписки sent_ids."""
+    if not blob:
+        return []
+    data = bytes(blob)
+    usable = len(data) - len(data) % RECORD.size
+    return list(RECORD.iter_unpack(data[:usable]))
+
+
+def sent_id_set(blob: bytes | None) -> set[int]:
+    """Возвращает множество id уже отправленных по подписке вакансий."""
+    return {vacancy_id for vacancy_id, _ in decode_sent_ids(blob)}
+
+
+def remember_sent_ids(blob: bytes | None, vacancy_ids: list, now: datetime, limit: int, max_age_days: int) -> Binary:
+    """
+    Добавляет id только что отправленных вакансий к записи подписки.
+
+    Записи старше max_age_days отбрасываются, а из оставшихся хранятся
+    только limit самых свежих — размер поля не превышает limit * 6 байт.
+
+    Параметры:
+        blob (bytes | None): текущее значение поля sent_ids
+        vacancy_ids (list): id отправленных вакансий
+        now (datetime): момент отправки
+        limit (int): максимум хранимых записей
+        max_age_days (int): сколько дней помнить отправленную вакансию
+
+    Возвращает:
+        Binary: новое значение поля sent_ids
+    """
+    today = epoch_day(now)
+    records = [(vid, day) for vid, day in decode_sent_ids(blob) if today - day <= max_age_days]
+    known = {vid for vid, _ in records}
+    for vacancy_id in vacancy_ids:
+        key = vacancy_key(vacancy_id)
+        if key not in known:
+            records.append((key, today))
+            known.add(key)
+    records = records[-limit:]
+    return Binary(b"".join(RECORD.pack(vid, day) for vid, day in records))
@@ -0,0 +1,71 @@
+import time
+
+from config import SCHEDULER_WRITE_BATCH, SCHEDULER_WRITE_FLUSH_SECONDS
+from db import bulk_update_subscriptions
+from logger import logger
+
+
+class SubscriptionWriteBack:
+    """
+    Накопитель изменений подписок для записи в MongoDB одной пачкой.
+
+    Вместо update_one на каждую подписку изменения ($set и $inc) копятся по _id
+    и уходят одним неупорядоченным bulk_write, когда накопилось max_size подписок,
+    когда с первого изменения прошло больше max_age секунд, или при явном flush().
+
+    Изменения после доставленной рассылки (last_sent, sent_ids) передаются с durable=True
+    и записываются сразу, вместе с накопленными к этому моменту, — иначе после аварийного
+    падения процесса пользователи получили бы те же вакансии ещё раз. Копятся только
+    некритичные изменения (перенос next_due без отправки, буфер дайджеста, счётчики):
+    их потеря лишь приводит к повторной проверке подписки.
+    """
+
+    def __init__(self, max_size: int = SCHEDULER_WRITE_BATCH, max_age: float = SCHEDULER_WRITE_FLUSH_SECONDS):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._pending: dict = {}  # _id -> {"$set": {...}, "$inc": {...}}
+        self._first_at: float | None = None
+        self.written = 0  # сколько подписок записано за время жизни накопителя
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def update(self, sub_id, fields: dict | None = None, inc: dict | None = None, durable: bool = False):
+        """
+        Добавляет изменения подписки; при превышении границ сразу записывает накопленное.
+        durable=True — изменение нельзя потерять (например, в нём id уже доставленных вакансий):
+        оно записывается сразу, вместе со всем накопленным к этому моменту.
+        """
+        update = self._pending.setdefault(sub_id, {})
+        if fields:
+            update.setdefault("$set", {}).update(fields)
+        if inc:
+            counters = update.setdefault("$inc", {})
+            for name, value in inc.items():
+                counters[name] = counters.get(name, 0) + value
+        if self._first_at is None:
+            self._first_at = time.monotonic()
+
+        if durable or len(self._pending) >= self.max_size or time.monotonic() - self._first_at >= self.max_age:
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """
+        Записывает накопленные изменения одним bulk_write.
+        При ошибке изменения остаются в накопителе до следующей попытки; возвращает False.
+        """
+        if not self._pending:
+            return True
+        pending, self._pending, self._first_at = self._pending, {}, None
+        try:
+            await bulk_update_subscriptions(pending)
+        except Exception as e:
+            logger.exception(f"[WRITE-BACK] Не удалось записать изменения {len(pending)} подписок: {e}")
+            # возвращаем изменения, чтобы следующий flush попробовал записать их ещё раз
+            for sub_id, update in pending.items():
+                self._pending.setdefault(sub_id, update)
+            self._first_at = time.monotonic()
+            return False
+        self.written += len(pending)
+        logger.debug(f"[WRITE-BACK] Записано изменений подписок: {len(pending)}")
+        return True
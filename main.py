@@ -1,23 +1,41 @@
+import time
+
+# начало запуска — до тяжёлых импортов, чтобы фаза imports учитывала и их
+STARTED_AT = time.monotonic()
+
 from aiogram import Bot, Dispatcher, types
 from aiogram.enums import ParseMode
 from aiogram import F
 from aiogram.client.default import DefaultBotProperties
 from aiogram.fsm.context import FSMContext
 import asyncio
+from contextlib import suppress
 from utils.user_settings_db import get_user_settings;
 from utils.user_settings_db import update_user_settings;
 from aiogram.types import BotCommandScopeDefault
 
 from config import CITIES
 
-from config import BOT_TOKEN
+from config import BOT_TOKEN, BOT_MODE, METRICS_ENABLED, PROFILING_ENABLED
 from handlers import subscribe
 from handlers import pylint
 from handlers import news
 from handlers import tips_and_learn
 from handlers import vacancies
 from handlers import settings
+from handlers import trends
 from jobs.scheduler import daily_job_sending
+from utils.news_feed import news_feed
+from utils.http_client import close_session
+from utils.pylint_pool import pylint_pool
+from utils.metrics import HandlerMetricsMiddleware, start_metrics_server
+from utils.profiling import ProfilingMiddleware, update_profiler
+from utils.webhook import run_webhook
+from utils.fsm_storage import MongoFSMStorage
+from utils.vacancy_archive import vacancy_archive
+from utils.startup import startup, handle_ready
+from db import init_db, close_db
+from utils.telegram_limiter import TelegramSendLimiter, ThrottlingRequestMiddleware
 
 from aiogram.types import BotCommand
 
@@ -26,6 +44,7 @@ commands = [
     BotCommand(command="subscribe", description="Оформить подписку на вакансии"),
     BotCommand(command="unsubscribe", description="Удалить подписку"),
     BotCommand(command="vacancies", description="Поиск вакансий по ключевым словам"),
+    BotCommand(command="trends", description="Статистика вакансий по городам и зарплатам"),
     BotCommand(command="news", description="Текущие новости из IT"),
     BotCommand(command="pylint", description="Полезные советы по Python-коду"),
     BotCommand(command="tip", description="Случайный совет для программиста"),
@@ -35,7 +54,17 @@ commands = [
 # === Константы и глобальные объекты ===
 
 bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher()
+# все отправки сообщений проходят через общий ограничитель частоты Telegram
+bot.session.middleware(ThrottlingRequestMiddleware(TelegramSendLimiter()))
+# состояния диалогов хранятся в MongoDB: переживают перезапуск и общие для всех копий бота
+dp = Dispatcher(storage=MongoFSMStorage())
+# время работы и ошибки всех хэндлеров (middleware диспетчера действуют и на вложенные роутеры)
+dp.message.middleware(HandlerMetricsMiddleware("message"))
+dp.callback_query.middleware(HandlerMetricsMiddleware("callback_query"))
+# сэмплирующий профиль медленных обновлений и контроль блокировок цикла событий
+if PROFILING_ENABLED:
+    dp.message.middleware(ProfilingMiddleware(update_profiler, "message"))
+    dp.callback_query.middleware(ProfilingMiddleware(update_profiler, "callback_query"))
 
 dp.include_router(subscribe.router)
 dp.include_router(pylint.router)
@@ -43,14 +72,82 @@ dp.include_router(news.router)
 dp.include_router(tips_and_learn.router)
 dp.include_router(vacancies.router)
 dp.include_router(settings.router)
+dp.include_router(trends.router)
 
 # === Хэндлеры ===
 
 
+@dp.startup()
+async def on_startup():
+    # бот готов принимать апдейты, как только диспетчер запустил polling или вебхук
+    startup.mark("updates")
+
+
+async def receive_updates():
+    if BOT_MODE == "webhook":
+        await run_webhook(dp, bot)
+    else:
+        # getUpdates не работает, пока у бота установлен вебхук
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
+
+
+async def run_scheduler(db_ready: asyncio.Task):
+    """Рассылка стартует, когда MongoDB готова (индексы и номера шардов подписок на месте)."""
+    try:
+        await db_ready
+    except Exception:
+        return
+    await daily_job_sending(bot)
+
+
 async def main():
-    await bot.set_my_commands(commands, scope=BotCommandScopeDefault())
-    asyncio.create_task(daily_job_sending(bot))
-    await dp.start_polling(bot)
+    startup.begin(STARTED_AT)
+    metrics_runner = None
+    if METRICS_ENABLED:
+        metrics_runner = await startup.run("metrics", start_metrics_server(routes={"/ready": handle_ready}))
+    if PROFILING_ENABLED:
+        update_profiler.start()
+
+    # подключения и прогрев идут в фоне параллельно и не задерживают приём апдейтов;
+    # хэндлеры, пришедшие раньше, просто дождутся соединения с MongoDB из пула
+    db_ready = asyncio.create_task(startup.run("mongo", init_db()))
+    background = [
+        asyncio.create_task(startup.run("pylint_pool", pylint_pool.start(), required=False)),
+        asyncio.create_task(startup.run(
+            "bot_commands", bot.set_my_commands(commands, scope=BotCommandScopeDefault()), required=False,
+        )),
+        # обновление ленты новостей останавливается вместе с остальными фоновыми задачами
+        asyncio.create_task(news_feed.run()),
+    ]
+    scheduler_task = asyncio.create_task(run_scheduler(db_ready))
+    updates_task = asyncio.create_task(receive_updates())
+    try:
+        await asyncio.wait({db_ready, updates_task}, return_when=asyncio.FIRST_EXCEPTION)
+        if updates_task.done():
+            await updates_task
+        else:
+            # без MongoDB бот работать не может — останавливаемся с ошибкой подключения
+            updates_task.cancel()
+            await db_ready
+    finally:
+        for task in (updates_task, db_ready, *background):
+            task.cancel()
+        await asyncio.gather(updates_task, db_ready, *background, return_exceptions=True)
+        # останавливаем рассылку до закрытия базы, чтобы она успела отдать аренды шардов
+        scheduler_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await scheduler_task
+        # дописываем в архив вакансии, накопленные с последней записи
+        await vacancy_archive.close()
+        # закрываем общий пул HTTP-соединений при остановке
+        await close_session()
+        await close_db()
+        pylint_pool.shutdown()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        if PROFILING_ENABLED:
+            await update_profiler.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
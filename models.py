@@ -10,13 +10,13 @@ class SubscriptionForm(StatesGroup):
     keywords — ожидание ввода ключевых слов для подписки;
     level — ожидание выбора уровня вакансий (junior, middle, senior);
     area — ожидание выбора региона/города;
-    frequency — ожидание выбора частоты рассылки (daily, weekly);
+    frequency — ожидание выбора частоты рассылки (daily, weekly или интервал вида 12h);
     confirm — ожидание подтверждения данных подписки.
     """
     keywords = State()    # пользователь вводит ключевые слова для вакансий
     level = State()       # выбор уровня вакансий (junior, middle, senior)
     area = State()        # выбор региона / города для поиска вакансий
-    frequency = State()   # выбор частоты рассылки: ежедневно или еженедельно
+    frequency = State()   # выбор частоты рассылки: ежедневно, еженедельно или произвольный интервал
     confirm = State()     # подтверждение всех введённых данных и сохранение
 
 
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+from logger import logger  # централизованный логгер
+
+# маркер «значения нет», чтобы отличать промах от закэшированного None
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру кэш в памяти процесса с временем жизни записей.
+
+    - При переполнении вытесняется запись, к которой дольше всего не обращались (LRU).
+    - Запись старше ttl секунд считается отсутствующей.
+    - Счётчики hits/misses помогают подобрать размер и ttl.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()  # ключ -> (истекает в, значение)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """
+        Возвращает значение по ключу или default, если записи нет или она устарела.
+        """
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """
+        Сохраняет значение; ttl переопределяет время жизни по умолчанию для этой записи.
+        """
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Удаляет запись, если она есть."""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Очищает кэш (счётчики сохраняются)."""
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """Возвращает размер кэша, счётчики попаданий/промахов и долю попаданий."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class StaleWhileRevalidateCache:
+    """
+    Асинхронный кэш результатов с политикой stale-while-revalidate.
+
+    - Пока запись свежая (моложе ttl) — отдаётся сразу.
+    - Когда запись устарела, но моложе stale_ttl — тоже отдаётся сразу,
+      а в фоне запускается одно (и только одно) обновление.
+    - При промахе конкурентные запросы одного ключа ждут одну общую загрузку.
+    - Размер ограничен maxsize записями с LRU-вытеснением.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, stale_ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data: OrderedDict[Hashable, tuple[float, float, Any]] = OrderedDict()  # ключ -> (свежо до, годно до, значение)
+        self._loading: dict[Hashable, asyncio.Task] = {}  # ключ -> выполняющаяся загрузка
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _store(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        self._data[key] = (now + self.ttl, now + self.stale_ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _start_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Запускает загрузку ключа, если она ещё не идёт, и возвращает её задачу."""
+        task = self._loading.get(key)
+        if task is None:
+            async def load():
+                try:
+                    value = await loader()
+                    self._store(key, value)
+                    return value
+                finally:
+                    self._loading.pop(key, None)
+
+            task = asyncio.create_task(load())
+            self._loading[key] = task
+        return task
+
+    @staticmethod
+    def _log_refresh_error(key: Hashable, task: asyncio.Task):
+        """Фоновое обновление не должно ронять запрос: ошибку только логируем, старое значение остаётся."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"[CACHE] Не удалось обновить запись {key}: {task.exception()}")
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Возвращает значение по ключу, при необходимости загружая его через loader.
+
+        Параметры:
+            key: ключ кэша
+            loader: корутинная функция без аргументов, загружающая актуальное значение
+
+        Исключения:
+            пробрасывает ошибку loader, только если в кэше нет даже устаревшего значения
+        """
+        entry = self._data.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            fresh_until, stale_until, value = entry
+            if now < fresh_until:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            if now < stale_until:
+                self._data.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._loading:
+                    task = self._start_load(key, loader)
+                    task.add_done_callback(lambda t: self._log_refresh_error(key, t))
+                return value
+            del self._data[key]
+
+        self.misses += 1
+        # shield: отмена одного ожидающего не отменяет общую загрузку для остальных
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def peek(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Возвращает значение без учёта срока годности и без загрузки (для аварийных сценариев)."""
+        entry = self._data.get(key)
+        return default if entry is None else entry[2]
+
+    def stats(self) -> dict:
+        """Возвращает размер кэша и счётчики свежих/устаревших попаданий и промахов."""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshing": len(self._loading),
+        }
@@ -0,0 +1,107 @@
+from html import escape
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, LinkPreviewOptions
+
+from config import DIGEST_MESSAGE_LIMIT
+
+# в дайджесте несколько ссылок — превью первой из них только мешает
+NO_PREVIEW = LinkPreviewOptions(is_disabled=True)
+
+ENTRY_SEPARATOR = "\n\n"
+NAME_LIMIT = 256  # длиннее названия обрезаются, чтобы одна вакансия всегда помещалась в сообщение
+
+
+def format_salary(salary: dict | None) -> str:
+    """Возвращает зарплату вакансии в виде «от 100 000 до 150 000 RUR» или пустую строку."""
+    if not salary:
+        return ""
+    parts = []
+    if salary.get("from"):
+        parts.append(f"от {salary['from']:,}".replace(",", " "))
+    if salary.get("to"):
+        parts.append(f"до {salary['to']:,}".replace(",", " "))
+    if not parts:
+        return ""
+    currency = salary.get("currency")
+    return " ".join(parts) + (f" {currency}" if currency else "")
+
+
+def format_vacancy(v: dict) -> str:
+    """
+    Форматирует одну вакансию в HTML: название, компания и зарплата (если есть), ссылка.
+    Все значения из ответа hh.ru экранируются.
+    """
+    name = v.get("name") or ""
+    if len(name) > NAME_LIMIT:
+        name = name[:NAME_LIMIT - 1] + "…"
+    lines = [f"<b>{escape(name)}</b>"]
+    details = [
+        escape(part) for part in ((v.get("employer") or {}).get("name"), format_salary(v.get("salary")))
+        if part
+    ]
+    if details:
+        lines.append(" · ".join(details))
+    lines.append(escape(v.get("alternate_url") or "", quote=False))
+    return "\n".join(lines)
+
+
+def render_digest(items: list[dict], header: str = "", limit: int = DIGEST_MESSAGE_LIMIT) -> list[tuple[str, list]]:
+    """
+    Упаковывает вакансии в как можно меньшее число сообщений.
+
+    Параметры:
+        items (list[dict]): Вакансии в порядке показа.
+        header (str): Готовый HTML-заголовок первого сообщения (может быть пустым).
+        limit (int): Максимальная длина одного сообщения.
+
+    Возвращает:
+        list[tuple[str, list]]: Тексты сообщений и id вакансий, попавших в каждое из них.
+    """
+    chunks = []
+    text, ids = header, []
+
+    for v in items:
+        entry = format_vacancy(v)
+        candidate = f"{text}{ENTRY_SEPARATOR}{entry}" if text else entry
+        if len(candidate) > limit and text:
+            chunks.append((text, ids))
+            text, ids = entry, []
+        else:
+            text = candidate
+        ids.append(v["id"])
+
+    if ids or text:
+        chunks.append((text, ids))
+    return chunks
+
+
+def more_button(url: str, text: str = "Ещё вакансии на hh.ru") -> InlineKeyboardMarkup:
+    """Инлайн-кнопка со ссылкой на полную выдачу поиска."""
+    return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=text, url=url)]])
+
+
+async def send_digest(bot, chat_id: int, items: list[dict], header: str = "",
+                      reply_markup: InlineKeyboardMarkup | None = None, sent: list | None = None):
+    """
+    Отправляет вакансии дайджестом: по возможности одним сообщением, при превышении
+    лимита длины — несколькими. Клавиатура прикрепляется к последнему сообщению.
+
+    Параметры:
+        bot (Bot): Экземпляр Telegram-бота.
+        chat_id (int): Кому отправлять.
+        items (list[dict]): Вакансии.
+        header (str): HTML-заголовок первого сообщения.
+        reply_markup (InlineKeyboardMarkup | None): Кнопки под дайджестом.
+        sent (list | None): Если передан, в него добавляются id вакансий из уже отправленных сообщений —
+            чтобы при обрыве отправки знать, что пользователь успел получить.
+    """
+    chunks = render_digest(items, header)
+    for i, (text, ids) in enumerate(chunks):
+        last = i == len(chunks) - 1
+        await bot.send_message(
+            chat_id, text,
+            link_preview_options=NO_PREVIEW,
+            reply_markup=reply_markup if last else None,
+        )
+        if sent is not None:
+            sent.extend(ids)
@@ -0,0 +1,36 @@
+import re
+
+from config import SCHEDULER_MIN_INTERVAL_MINUTES
+
+# сколько минут соответствует каждой именованной частоте рассылки
+FREQUENCY_MINUTES = {
+    "daily": 24 * 60,
+    "weekly": 7 * 24 * 60
+}
+
+# произвольная частота: число и единица — часы или дни, например "12h" или "3d"
+CUSTOM_FREQUENCY_RE = re.compile(r"^(\d+)\s*([hd])$")
+
+
+def frequency_minutes(frequency: str | None) -> int | None:
+    """
+    Возвращает интервал рассылки в минутах.
+
+    Параметры:
+        frequency (str | None): "daily", "weekly" или произвольный интервал вида "12h" / "3d".
+
+    Возвращает:
+        int | None: Интервал в минутах или None, если частота не распознана
+        либо меньше SCHEDULER_MIN_INTERVAL_MINUTES.
+    """
+    if frequency in FREQUENCY_MINUTES:
+        return FREQUENCY_MINUTES[frequency]
+
+    match = CUSTOM_FREQUENCY_RE.match((frequency or "").strip().lower())
+    if not match:
+        return None
+    value, unit = int(match.group(1)), match.group(2)
+    minutes = value * 60 if unit == "h" else value * 24 * 60
+    if minutes < SCHEDULER_MIN_INTERVAL_MINUTES:
+        return None
+    return minutes
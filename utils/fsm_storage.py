@@ -0,0 +1,137 @@
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey, DEFAULT_DESTINY
+from pymongo import ReturnDocument
+
+from config import BOT_MODE, FSM_STATE_TTL, FSM_CACHE_SIZE, FSM_CACHE_TTL
+from db import fsm_states_collection
+from utils.cache import TTLCache, MISSING
+
+# документ состояния: {"_id": "<chat>:<user>", "s": состояние, "d": данные диалога, "exp": когда удалить}
+EMPTY = (None, {})
+
+
+def storage_key_id(key: StorageKey) -> str:
+    """Короткий id документа: чат и пользователь, плюс тема/бизнес-чат/destiny, если они заданы."""
+    parts = [str(key.chat_id), str(key.user_id)]
+    if key.thread_id:
+        parts.append(f"t{key.thread_id}")
+    if key.business_connection_id:
+        parts.append(f"b{key.business_connection_id}")
+    if key.destiny != DEFAULT_DESTINY:
+        parts.append(key.destiny)
+    return ":".join(parts)
+
+
+def resolve_state(value: StateType) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, State):
+        return value.state
+    return str(value)
+
+
+class MongoFSMStorage(BaseStorage):
+    """
+    Хранилище состояний FSM (диалоги /subscribe и /pylint) в MongoDB.
+
+    - Состояние и данные диалога лежат в одном компактном документе: каждое чтение
+      и каждая запись — один запрос к MongoDB.
+    - Каждая запись продлевает срок жизни документа на FSM_STATE_TTL; брошенные
+      диалоги удаляет TTL-индекс MongoDB.
+    - В режиме polling апдейты получает только один экземпляр бота, поэтому недавно прочитанные
+      и записанные документы держатся в локальном кэше на FSM_CACHE_TTL секунд.
+    - В режиме webhook апдейты одного пользователя могут попасть на разные копии бота за
+      балансировщиком; локальная копия состояния могла бы устареть, и шаг диалога применился бы
+      не к тому состоянию, поэтому кэш отключён и каждое чтение идёт в MongoDB.
+
+    Состояния переживают перезапуск бота и общие для всех его копий.
+    """
+
+    def __init__(self, ttl: int = FSM_STATE_TTL, cache_size: int = FSM_CACHE_SIZE,
+                 cache_ttl: int = FSM_CACHE_TTL if BOT_MODE == "polling" else 0):
+        self.ttl = ttl
+        # cache_ttl=0 — без локального кэша
+        self.cache = TTLCache(cache_size, cache_ttl) if cache_ttl else None
+
+    def _expires_at(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+
+    def _remember(self, doc_id: str, doc: dict | None) -> tuple[str | None, dict]:
+        entry = (doc.get("s"), doc.get("d") or {}) if doc else EMPTY
+        if self.cache is not None:
+            self.cache.set(doc_id, entry)
+        return entry
+
+    async def _read(self, key: StorageKey) -> tuple[str | None, dict]:
+        doc_id = storage_key_id(key)
+        entry = self.cache.get(doc_id) if self.cache is not None else MISSING
+        if entry is MISSING:
+            entry = self._remember(doc_id, await fsm_states_collection().find_one({"_id": doc_id}))
+        return entry
+
+    async def _write(self, key: StorageKey, fields: dict) -> tuple[str | None, dict]:
+        """Записывает поля документа (создавая его при необходимости) и продлевает срок жизни."""
+        doc_id = storage_key_id(key)
+        doc = await fsm_states_collection().find_one_and_update(
+            {"_id": doc_id}, {"$set": {**fields, "exp": self._expires_at()}},
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        return self._remember(doc_id, doc)
+
+    async def _unset(self, key: StorageKey, field: str) -> tuple[str | None, dict]:
+        """
+        Убирает из документа состояние ("s") или данные ("d").
+
+        Если второго поля в документе нет, документ сразу удаляется одним запросом;
+        условие удаления проверяется атомарно, поэтому параллельная запись второго поля
+        не потеряется. Иначе поле снимается обновлением (без upsert — пустой документ не нужен).
+        """
+        doc_id = storage_key_id(key)
+        other = "d" if field == "s" else "s"
+        result = await fsm_states_collection().delete_one({"_id": doc_id, other: {"$exists": False}})
+        if result.deleted_count:
+            return self._remember(doc_id, None)
+        doc = await fsm_states_collection().find_one_and_update(
+            {"_id": doc_id}, {"$unset": {field: 1}, "$set": {"exp": self._expires_at()}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return self._remember(doc_id, doc)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = resolve_state(state)
+        if value is None:
+            await self._unset(key, "s")
+        else:
+            await self._write(key, {"s": value})
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _ = await self._read(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        if data:
+            await self._write(key, {"d": data})
+        else:
+            await self._unset(key, "d")
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = await self._read(key)
+        return dict(data)
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> dict[str, Any]:
+        if not data:
+            return await self.get_data(key)
+        _, merged = await self._write(key, {f"d.{name}": value for name, value in data.items()})
+        return dict(merged)
+
+    async def close(self) -> None:
+        # клиент MongoDB общий для всего бота и закрывается в db.close_db()
+        if self.cache is not None:
+            self.cache.clear()
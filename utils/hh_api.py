@@ -1,5 +1,19 @@
-import requests
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Callable
+import aiohttp
+from urllib.parse import urlencode
 from datetime import datetime, timedelta, timezone
+from config import (
+    HH_API_URL, HH_SEARCH_URL, HH_API_TIMEOUT, HH_API_CONNECT_TIMEOUT, HH_HARVEST_CONCURRENCY, HH_MAX_DEPTH, VACANCY_CACHE_SIZE,
+    VACANCY_CACHE_TTL, VACANCY_CACHE_STALE_TTL, HH_RATE_MAX, HH_RATE_MIN, HH_RATE_STEP, HH_RETRY_ATTEMPTS,
+    HH_RETRY_ATTEMPTS_INTERACTIVE, HH_RETRY_BASE_DELAY, HH_RETRY_MAX_DELAY, HH_BREAKER_FAILURES, HH_BREAKER_COOLDOWN,
+)
+from utils.cache import StaleWhileRevalidateCache, MISSING
+from utils.http_client import get_session
+from utils.resilience import ResiliencePolicy, AdaptiveRateLimiter, CircuitBreaker, CircuitOpenError
+from utils.telegram_limiter import send_priority, PRIORITY_INTERACTIVE
+from utils.metrics import track, track_cache, HH_REQUEST_SECONDS, HH_REQUEST_ERRORS
 from logger import logger  # централизованный логгер
 
 # Заголовки для имитации обычного браузера (некоторые API отказывают ботам)
@@ -7,7 +21,66 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; TelegramBot/1.0; +http://example.com/bot)"
 }
 
-def fetch_vacancies(level=None, keywords=None, area=None, per_page=5, since_minutes_ago=None):
+
+def normalize_query(keywords=None, level=None, area=None) -> tuple[str, str, str]:
+    """
+    Приводит параметры поиска к каноническому виду, чтобы одинаковые по смыслу
+    запросы ("Python  Backend" и "python backend") давали один и тот же ключ.
+
+    Параметры:
+        keywords (str): ключевые слова поиска
+        level (str): уровень вакансии
+        area (str): ID региона
+
+    Возвращает:
+        tuple[str, str, str]: нормализованные (keywords, level, area); пустая строка — параметр не задан
+    """
+    return (
+        " ".join((keywords or "").lower().split()),
+        (level or "").strip().lower(),
+        str(area or "").strip(),
+    )
+
+
+def parse_published_at(item: dict) -> datetime | None:
+    """
+    Извлекает дату публикации вакансии из ответа hh.ru.
+
+    Параметры:
+        item (dict): вакансия из поля items ответа API
+
+    Возвращает:
+        datetime | None: дата публикации с часовым поясом или None, если поле отсутствует или некорректно
+    """
+    published_at = item.get("published_at")
+    if not published_at:
+        return None
+    try:
+        # hh.ru отдаёт даты в формате 2024-05-01T12:00:00+0300
+        return datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        return None
+
+# таймауты запроса к hh.ru: общий и на установку соединения
+TIMEOUT = aiohttp.ClientTimeout(total=HH_API_TIMEOUT, sock_connect=HH_API_CONNECT_TIMEOUT)
+
+# общая для планировщика и хэндлеров политика запросов к hh.ru: темп, повторы, предохранитель
+hh_policy = ResiliencePolicy(
+    "hh",
+    limiter=AdaptiveRateLimiter(HH_RATE_MAX, HH_RATE_MIN, HH_RATE_STEP, HH_RETRY_MAX_DELAY),
+    breaker=CircuitBreaker(HH_BREAKER_FAILURES, HH_BREAKER_COOLDOWN),
+    attempts=HH_RETRY_ATTEMPTS,
+    base_delay=HH_RETRY_BASE_DELAY,
+    max_delay=HH_RETRY_MAX_DELAY,
+)
+
+# кэш ответов для интерактивного поиска: (keywords, level, area, per_page) -> список вакансий
+vacancy_cache = StaleWhileRevalidateCache(
+    maxsize=VACANCY_CACHE_SIZE, ttl=VACANCY_CACHE_TTL, stale_ttl=VACANCY_CACHE_STALE_TTL
+)
+track_cache("vacancies", vacancy_cache)
+
+async def fetch_vacancies(level=None, keywords=None, area=None, per_page=5, since_minutes_ago=None):
     """
     Выполняет запрос к API hh.ru для получения вакансий по заданным параметрам.
 
@@ -22,7 +95,28 @@ def fetch_vacancies(level=None, keywords=None, area=None, per_page=5, since_minu
         list: список словарей с данными о вакансиях
 
     Исключения:
-        requests.exceptions.RequestException: если запрос завершился с ошибкой
+        aiohttp.ClientError: если запрос завершился с ошибкой
+        asyncio.TimeoutError: если hh.ru не ответил за HH_API_TIMEOUT секунд
+    """
+    params = build_params(level, keywords, area, per_page, since_minutes_ago)
+    data = await fetch_page(params)
+    logger.info(f"[HH API] Получено {len(data.get('items', []))} вакансий")
+    return data.get("items", [])
+
+
+def build_params(level=None, keywords=None, area=None, per_page=5, since_minutes_ago=None) -> dict:
+    """
+    Собирает параметры запроса к /vacancies из параметров поиска.
+
+    Параметры:
+        level (str): уровень вакансии
+        keywords (str): ключевые слова поиска
+        area (str): ID региона
+        per_page (int): количество вакансий на странице
+        since_minutes_ago (int): если задано — только вакансии за последние N минут, новые сначала
+
+    Возвращает:
+        dict: параметры GET-запроса
     """
     query_parts = []
 
@@ -48,13 +142,151 @@ def fetch_vacancies(level=None, keywords=None, area=None, per_page=5, since_minu
         params["date_from"] = date_from
         params["order_by"] = "publication_time"
 
-    try:
+    return params
+
+
+def search_url(level=None, keywords=None, area=None) -> str:
+    """Ссылка на ту же выдачу на сайте hh.ru — для кнопки «Ещё вакансии»."""
+    params = build_params(level=level, keywords=keywords, area=area)
+    params.pop("per_page", None)
+    return f"{HH_SEARCH_URL}?{urlencode(params)}"
+
+
+async def fetch_page(params: dict, page: int = 0) -> dict:
+    """
+    Запрашивает одну страницу выдачи /vacancies через hh_policy.
+
+    Запросы пользователей (send_priority == PRIORITY_INTERACTIVE) получают токены ограничителя
+    раньше фоновых и повторяются не больше HH_RETRY_ATTEMPTS_INTERACTIVE раз.
+
+    Параметры:
+        params (dict): параметры запроса (см. build_params)
+        page (int): номер страницы, начиная с 0
+
+    Возвращает:
+        dict: ответ API целиком (items, pages, found и т.д.)
+
+    Исключения:
+        aiohttp.ClientError: если запрос завершился с ошибкой
+        asyncio.TimeoutError: если hh.ru не ответил за HH_API_TIMEOUT секунд
+        CircuitOpenError: если hh.ru сейчас считается недоступным
+    """
+    params = {**params, "page": page} if page else params
+
+    async def request() -> dict:
         logger.debug(f"[HH API] Выполняется запрос с параметрами: {params}")
-        response = requests.get("https://api.hh.ru/vacancies", params=params, headers=HEADERS)
-        response.raise_for_status()
-        data = response.json()
-        logger.info(f"[HH API] Получено {len(data.get('items', []))} вакансий")
-        return data.get("items", [])
-    except requests.exceptions.RequestException as e:
+        session = get_session()
+        with track(HH_REQUEST_SECONDS, HH_REQUEST_ERRORS, endpoint="vacancies"):
+            async with session.get(HH_API_URL, params=params, headers=HEADERS, timeout=TIMEOUT) as response:
+                response.raise_for_status()
+                return await response.json()
+
+    priority = send_priority.get()
+    attempts = HH_RETRY_ATTEMPTS_INTERACTIVE if priority == PRIORITY_INTERACTIVE else HH_RETRY_ATTEMPTS
+    try:
+        return await hh_policy.call(request, priority=priority, attempts=attempts)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.exception(f"[HH API] Ошибка при выполнении запроса: {e}")
         raise
+
+
+async def iter_vacancies(level=None, keywords=None, area=None, since_minutes_ago=None, per_page=100,
+                         max_pages=None, concurrency=HH_HARVEST_CONCURRENCY, stats: dict | None = None,
+                         ) -> AsyncIterator[dict]:
+    """
+    Режим «сбора»: постранично обходит всю выдачу hh.ru и отдаёт вакансии по одной.
+
+    Первая страница запрашивается сразу, остальные — параллельно, но не больше
+    concurrency запросов одновременно. Вакансии отдаются в порядке страниц; в памяти
+    держатся только загружаемые сейчас страницы. Если вызывающий код прервёт обход
+    (break), незавершённые запросы отменяются.
+
+    Параметры:
+        level (str): уровень вакансии
+        keywords (str): ключевые слова поиска
+        area (str): ID региона
+        since_minutes_ago (int): если задано — только вакансии за последние N минут
+        per_page (int): размер страницы (hh.ru допускает до 100)
+        max_pages (int | None): ограничение числа страниц; None — сколько отдаст hh.ru
+        concurrency (int): сколько страниц загружать одновременно
+        stats (dict | None): если передан — в него записывается found (сколько вакансий нашёл hh.ru)
+            и truncated (обход обрезан по max_pages или HH_MAX_DEPTH, часть выдачи не получена)
+
+    Возвращает:
+        AsyncIterator[dict]: вакансии без повторов
+    """
+    params = build_params(level, keywords, area, per_page, since_minutes_ago)
+    first = await fetch_page(params)
+
+    # hh.ru не отдаёт больше HH_MAX_DEPTH вакансий на один запрос, сколько бы страниц ни нашлось
+    pages = min(first.get("pages", 1), HH_MAX_DEPTH // per_page)
+    if max_pages is not None:
+        pages = min(pages, max_pages)
+    logger.info(f"[HH API] Сбор вакансий: найдено {first.get('found', 0)}, страниц к загрузке {pages}")
+    if stats is not None:
+        stats["found"] = first.get("found", 0)
+        stats["truncated"] = first.get("pages", 1) > pages
+
+    # при сортировке по дате новые публикации сдвигают страницы — отсекаем повторы
+    seen = set()
+    pending: deque[asyncio.Task] = deque()
+    next_page = 1
+    try:
+        data = first
+        while True:
+            for item in data.get("items", []):
+                if item["id"] not in seen:
+                    seen.add(item["id"])
+                    yield item
+
+            # поддерживаем окно из concurrency параллельных запросов
+            while next_page < pages and len(pending) < concurrency:
+                pending.append(asyncio.create_task(fetch_page(params, next_page)))
+                next_page += 1
+            if not pending:
+                break
+            data = await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+            # забираем ошибку уже завершившихся запросов, чтобы она не всплыла в логах asyncio
+            if task.done() and not task.cancelled():
+                task.exception()
+
+
+async def cached_fetch_vacancies(level=None, keywords=None, area=None, per_page=5,
+                                 on_fetch: Callable[[list], None] | None = None):
+    """
+    То же, что fetch_vacancies, но через кэш: популярные запросы отдаются из памяти,
+    а устаревшие ответы обновляются в фоне одним запросом к hh.ru.
+    Если hh.ru недоступен, отдаётся последний известный ответ, даже старше VACANCY_CACHE_STALE_TTL.
+
+    Параметры:
+        level (str): уровень вакансии
+        keywords (str): ключевые слова поиска
+        area (str): ID региона
+        per_page (int): количество вакансий
+        on_fetch (Callable | None): вызывается с вакансиями, только что полученными от hh.ru
+            (не из кэша), — например, чтобы записать их в архив
+
+    Возвращает:
+        list: список словарей с данными о вакансиях
+    """
+    keywords, level, area = normalize_query(keywords, level, area)
+    key = (keywords, level, area, per_page)
+    # запоминаем заранее: get_or_load удаляет из кэша слишком старую запись
+    fallback = vacancy_cache.peek(key)
+
+    async def load():
+        items = await fetch_vacancies(level=level or None, keywords=keywords or None, area=area or None, per_page=per_page)
+        if on_fetch is not None:
+            on_fetch(items)
+        return items
+
+    try:
+        return await vacancy_cache.get_or_load(key, load)
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+        if fallback is MISSING:
+            raise
+        logger.warning(f"[HH API] hh.ru недоступен ({e}), отдаём сохранённый ответ для {key}")
+        return fallback
@@ -0,0 +1,44 @@
+import aiohttp
+from config import HTTP_CONNECTION_LIMIT, HTTP_CONNECTION_LIMIT_PER_HOST, HTTP_KEEPALIVE_TIMEOUT
+from logger import logger  # централизованный логгер
+
+# единственная HTTP-сессия процесса: создаётся при первом обращении и живёт до остановки бота
+_session: aiohttp.ClientSession | None = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Возвращает общую aiohttp-сессию с пулом keep-alive соединений.
+
+    Сессия создаётся лениво (внутри работающего event loop) и переиспользуется
+    всеми клиентами, чтобы не открывать новое TCP/TLS-соединение на каждый запрос.
+
+    Возвращает:
+        aiohttp.ClientSession: общая сессия процесса
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_CONNECTION_LIMIT,
+            limit_per_host=HTTP_CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,  # кэшируем DNS, чтобы не резолвить хост на каждый запрос
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+        logger.info(
+            f"[HTTP] Создан пул соединений: limit={HTTP_CONNECTION_LIMIT}, "
+            f"limit_per_host={HTTP_CONNECTION_LIMIT_PER_HOST}"
+        )
+    return _session
+
+
+async def close_session():
+    """
+    Закрывает общую HTTP-сессию и все соединения пула.
+    Вызывается при остановке бота.
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("[HTTP] Пул соединений закрыт")
+    _session = None
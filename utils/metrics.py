@@ -0,0 +1,296 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from aiohttp import web
+from pymongo import monitoring
+
+from config import METRICS_HOST, METRICS_PORT
+from logger import logger
+
+# границы корзин гистограмм задержек, секунды
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    """Набор метрик процесса; отдаётся целиком в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class Metric:
+    """
+    Базовая метрика с набором меток.
+    Значения хранятся по кортежу значений меток; код бота однопоточный (asyncio), блокировки не нужны.
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), registry: Registry = registry):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик (число запросов, ошибок)."""
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Текущее значение (размер очереди, длительность последнего прохода)."""
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам — для задержек операций."""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS, registry: Registry = registry):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # счётчики по корзинам (последняя — +Inf), сумма, количество
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CacheStats(Metric):
+    """
+    Статистика кэшей процесса: значения берутся из cache.stats() в момент отдачи /metrics,
+    поэтому на обращения к кэшу метрика ничего не добавляет.
+    Кэш подключается через track_cache(); stat — ключ словаря stats().
+    """
+
+    def __init__(self, name: str, documentation: str, stat: str, type: str = "counter", registry: Registry = registry):
+        super().__init__(name, documentation, ("cache",), registry)
+        self.stat = stat
+        self.type = type
+
+    def samples(self) -> list[str]:
+        lines = []
+        for cache_name, cache in _caches.items():
+            stats = cache.stats()
+            if self.stat in stats:
+                lines.append(f"{self.name}{_format_labels(self.labelnames, (cache_name,))} {stats[self.stat]}")
+        return lines
+
+
+# кэши, статистика которых отдаётся в /metrics: имя -> объект с методом stats()
+_caches: dict[str, Any] = {}
+
+
+def track_cache(name: str, cache):
+    """Подключает кэш к метрикам cache_* с меткой cache=name."""
+    _caches[name] = cache
+
+
+@contextmanager
+def track(histogram: Histogram, errors: Counter | None = None, **labels):
+    """
+    Замеряет длительность блока в histogram; если блок завершился исключением,
+    увеличивает errors с теми же метками. Отмена задачи ошибкой не считается.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors is not None:
+            errors.inc(**labels)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+# === Метрики бота ===
+
+HH_REQUEST_SECONDS = Histogram("hh_request_seconds", "Длительность запросов к API hh.ru", ("endpoint",))
+HH_REQUEST_ERRORS = Counter("hh_request_errors_total", "Ошибки запросов к API hh.ru", ("endpoint",))
+
+UPSTREAM_RETRIES = Counter("upstream_retries_total", "Повторы запросов к внешним сервисам", ("service", "reason"))
+UPSTREAM_CIRCUIT_REJECTED = Counter(
+    "upstream_circuit_rejected_total", "Запросы к внешним сервисам, отклонённые предохранителем", ("service",)
+)
+UPSTREAM_CIRCUIT_OPEN = Gauge("upstream_circuit_open", "1 — предохранитель внешнего сервиса разомкнут", ("service",))
+UPSTREAM_RATE_LIMIT = Gauge("upstream_rate_limit", "Текущий допустимый темп запросов к внешнему сервису, запросов/с", ("service",))
+
+MONGO_COMMAND_SECONDS = Histogram("mongo_command_seconds", "Длительность команд MongoDB", ("command", "collection"))
+MONGO_COMMAND_ERRORS = Counter("mongo_command_errors_total", "Ошибки команд MongoDB", ("command", "collection"))
+
+HANDLER_SECONDS = Histogram("handler_seconds", "Длительность обработки апдейтов хэндлерами", ("event", "handler"))
+HANDLER_ERRORS = Counter("handler_errors_total", "Исключения в хэндлерах", ("event", "handler"))
+SLOW_UPDATES = Counter("slow_updates_total", "Обновления, обработанные дольше PROFILE_SLOW_SECONDS", ("event", "handler"))
+EVENT_LOOP_LAG_SECONDS = Histogram("event_loop_lag_seconds", "Насколько позже срока просыпается цикл событий")
+EVENT_LOOP_BLOCKS = Counter(
+    "event_loop_blocks_total", "Блокировки цикла событий дольше PROFILE_LOOP_BLOCK_SECONDS по хэндлерам в работе", ("handler",)
+)
+
+TG_SEND_SECONDS = Histogram("telegram_send_seconds", "Длительность запросов отправки в Telegram", ("method",))
+TG_SEND_ERRORS = Counter("telegram_send_errors_total", "Ошибки запросов отправки в Telegram", ("method",))
+TG_LIMITER_WAIT_SECONDS = Histogram(
+    "telegram_limiter_wait_seconds", "Ожидание в ограничителе частоты перед отправкой", ("priority",)
+)
+TG_RETRY_AFTER = Counter("telegram_retry_after_total", "Ответы Telegram с flood control (RetryAfter)")
+
+RSS_FETCH_SECONDS = Histogram("rss_fetch_seconds", "Длительность загрузки RSS-лент", ("feed",))
+RSS_FETCH_ERRORS = Counter("rss_fetch_errors_total", "Ошибки загрузки RSS-лент", ("feed",))
+
+CACHE_ENTRIES = CacheStats("cache_entries", "Сколько записей сейчас в кэше", "size", type="gauge")
+CACHE_MAX_ENTRIES = CacheStats("cache_max_entries", "Предельный размер кэша, записей", "maxsize", type="gauge")
+CACHE_HITS = CacheStats("cache_hits_total", "Попадания в кэш (для stale-while-revalidate — свежие записи)", "hits")
+CACHE_STALE_HITS = CacheStats("cache_stale_hits_total", "Отданные устаревшие записи, обновляемые в фоне", "stale_hits")
+CACHE_MISSES = CacheStats("cache_misses_total", "Промахи кэша", "misses")
+
+PYLINT_RUN_SECONDS = Histogram("pylint_run_seconds", "Длительность проверки кода pylint, включая ожидание в очереди")
+PYLINT_ERRORS = Counter("pylint_errors_total", "Неудачные проверки pylint", ("reason",))
+PYLINT_CACHE_HITS = Counter("pylint_cache_hits_total", "Проверки pylint, отданные из кэша")
+
+SCHEDULER_RUN_SECONDS = Histogram("scheduler_run_seconds", "Длительность обработки созревших подписок за один проход")
+SCHEDULER_DUE = Gauge("scheduler_due_subscriptions", "Сколько подписок созрело в последнем проходе")
+SCHEDULER_QUEUE_SIZE = Gauge("scheduler_queue_size", "Сколько подписок ждёт в очереди планировщика")
+SCHEDULER_LAG_SECONDS = Gauge(
+    "scheduler_lag_seconds", "Насколько позже своего next_due обработана самая старая подписка прохода"
+)
+SCHEDULER_LAST_RUN = Gauge("scheduler_last_run_timestamp_seconds", "Время окончания последнего прохода (unix)")
+
+STARTUP_PHASE_SECONDS = Gauge("startup_phase_seconds", "Длительность фаз запуска бота", ("phase",))
+BOT_READY = Gauge("bot_ready", "1 — бот запущен и готов обрабатывать апдейты")
+
+
+def handler_name(data: dict[str, Any]) -> str:
+    """Имя функции-хэндлера, выбранного aiogram для обновления (доступно во внутренних middleware)."""
+    return getattr(getattr(data.get("handler"), "callback", None), "__name__", "unknown")
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware aiogram: замеряет время работы хэндлера и считает исключения.
+    Регистрируется на наблюдателях диспетчера и действует на хэндлеры всех вложенных роутеров.
+    """
+
+    def __init__(self, event: str):
+        self.event = event
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        with track(HANDLER_SECONDS, HANDLER_ERRORS, event=self.event, handler=handler_name(data)):
+            return await handler(event, data)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Слушатель команд pymongo: каждая команда к серверу (find, getMore, update, insert…)
+    попадает в гистограмму с меткой команды и коллекции.
+    """
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, failed: bool):
+        collection = self._collections.pop(event.request_id, "")
+        labels = {"command": event.command_name, "collection": collection}
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1_000_000, **labels)
+        if failed:
+            MONGO_COMMAND_ERRORS.inc(**labels)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, failed=True)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+async def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT,
+                               routes: dict[str, Callable] | None = None) -> web.AppRunner:
+    """
+    Поднимает локальный HTTP-сервер с эндпоинтом /metrics и дополнительными GET-эндпоинтами routes.
+    Возвращает AppRunner — для остановки сервера через runner.cleanup().
+    """
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    for path, route_handler in (routes or {}).items():
+        app.router.add_get(path, route_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"[METRICS] Метрики доступны на http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime
+
+import aiohttp
+
+from config import RSS_URLS, NEWS_TOP_N, NEWS_REFRESH_SECONDS, NEWS_FETCH_TIMEOUT
+from utils.http_client import get_session
+from utils.metrics import track, RSS_FETCH_SECONDS, RSS_FETCH_ERRORS
+from logger import logger  # централизованный логгер
+
+# таймаут загрузки одной ленты
+TIMEOUT = aiohttp.ClientTimeout(total=NEWS_FETCH_TIMEOUT)
+
+
+def parse_date(entry) -> datetime:
+    """
+    Извлекает дату публикации из RSS-записи.
+
+    Параметры:
+        entry: Один элемент из RSS-ленты, полученный через feedparser.
+
+    Возвращает:
+        datetime: Дата публикации или datetime.min, если ничего не удалось найти.
+    """
+    if hasattr(entry, "published_parsed") and entry.published_parsed:
+        return datetime(*entry.published_parsed[:6])
+    if hasattr(entry, "updated_parsed") and entry.updated_parsed:
+        return datetime(*entry.updated_parsed[:6])
+    return datetime.min
+
+
+def parse_feed(content: bytes) -> list[dict]:
+    """
+    Разбирает XML ленты и оставляет только нужные боту поля.
+    Выполняется в отдельном потоке: feedparser работает синхронно.
+
+    Параметры:
+        content (bytes): тело ответа сервера
+
+    Возвращает:
+        list[dict]: записи ленты (title, link, published, date)
+    """
+    # feedparser импортируется при первом разборе, а не при запуске бота
+    import feedparser
+
+    feed = feedparser.parse(content)
+    return [
+        {
+            "title": entry.get("title", "без названия"),
+            "link": entry.get("link"),
+            "published": entry.get("published", entry.get("updated", "дата неизвестна")),
+            "date": parse_date(entry),
+        }
+        for entry in feed.entries
+        if entry.get("link")
+    ]
+
+
+class NewsFeed:
+    """
+    Объединённая лента новостей, которая обновляется в фоне.
+
+    - Все RSS-источники загружаются параллельно через общий пул HTTP-соединений.
+    - Повторные загрузки условные (ETag / Last-Modified): неизменившаяся лента
+      не скачивается и не разбирается заново.
+    - XML разбирается вне event loop.
+    - В памяти хранится готовый список top_n свежих записей без повторов,
+      поэтому обработчик /news только читает его.
+    """
+
+    def __init__(self, urls: list[str], top_n: int):
+        self.urls = urls
+        self.top_n = top_n
+        self.entries: list[dict] = []                  # готовая к показу лента, новые сначала
+        self.updated_at: datetime | None = None        # время последнего обновления
+        self._feeds: dict[str, list[dict]] = {}        # url -> последние разобранные записи
+        self._validators: dict[str, dict[str, str]] = {}  # url -> заголовки для условного запроса
+
+    async def _fetch(self, url: str):
+        """Загружает одну ленту; при ответе 304 оставляет прежние записи."""
+        headers = {}
+        validators = self._validators.get(url, {})
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        with track(RSS_FETCH_SECONDS, RSS_FETCH_ERRORS, feed=url):
+            async with get_session().get(url, headers=headers, timeout=TIMEOUT) as response:
+                if response.status == 304:
+                    logger.debug(f"[NEWS] Лента не изменилась: {url}")
+                    return
+                response.raise_for_status()
+                content = await response.read()
+                self._validators[url] = {
+                    key: value for key, value in (
+                        ("etag", response.headers.get("ETag")),
+                        ("last_modified", response.headers.get("Last-Modified")),
+                    ) if value
+                }
+
+        entries = await asyncio.to_thread(parse_feed, content)
+        if not entries:
+            logger.warning(f"[NEWS] Лента пуста: {url}")
+        self._feeds[url] = entries
+
+    async def refresh(self):
+        """Обновляет все ленты и пересобирает объединённый список."""
+        results = await asyncio.gather(*(self._fetch(url) for url in self.urls), return_exceptions=True)
+        for url, result in zip(self.urls, results):
+            if isinstance(result, Exception):
+                logger.warning(f"[NEWS] Ошибка при загрузке {url}: {result}")
+
+        # объединяем, убираем повторы по ссылке и сортируем по дате публикации
+        merged = {}
+        for entries in self._feeds.values():
+            for entry in entries:
+                merged.setdefault(entry["link"], entry)
+        self.entries = sorted(merged.values(), key=lambda e: e["date"], reverse=True)[:self.top_n]
+        self.updated_at = datetime.now()
+        logger.info(f"[NEWS] Лента обновлена: {len(merged)} записей, в показ {len(self.entries)}")
+
+    async def run(self):
+        """Фоновый цикл обновления ленты."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.exception(f"[NEWS] Ошибка при обновлении ленты: {e}")
+            await asyncio.sleep(NEWS_REFRESH_SECONDS)
+
+
+# общая лента процесса: обновляется фоновой задачей из main.py, читается обработчиком /news
+news_feed = NewsFeed(RSS_URLS, NEWS_TOP_N)
@@ -0,0 +1,258 @@
+import asyncio
+import itertools
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from config import (
+    PROFILE_DIR, PROFILE_SLOW_SECONDS, PROFILE_SAMPLE_INTERVAL, PROFILE_LOOP_BLOCK_SECONDS, PROFILE_DUMP_COOLDOWN,
+)
+from utils.metrics import handler_name, EVENT_LOOP_LAG_SECONDS, EVENT_LOOP_BLOCKS, SLOW_UPDATES
+from logger import logger  # централизованный логгер
+
+# глубже этого стеки при сэмплировании обрезаются
+MAX_STACK_DEPTH = 64
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+def fold_stack(frame) -> str:
+    """Стек потока в «свёрнутом» виде (корень;…;вершина) — формат flamegraph.pl и speedscope."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def fold_task(task: asyncio.Task) -> tuple[str, bool]:
+    """
+    Стек задачи asyncio в «свёрнутом» виде: цепочка корутин от корневой по cr_await
+    до той, что сейчас ждёт; в вершине — тип ожидаемого объекта (Future, sleep и т. п.).
+
+    Возвращает:
+        tuple[str, bool]: стек и признак того, что задача сейчас выполняется в цикле событий
+            (тогда точнее стек потока — он включает и синхронные вызовы).
+    """
+    names = []
+    awaitable = task.get_coro()
+    running = False
+    while awaitable is not None and len(names) < MAX_STACK_DEPTH:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) \
+            or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            # дошли до Future или объекта без кадра — он и есть то, чего ждёт задача
+            names.append(f"await {type(awaitable).__name__}")
+            break
+        names.append(frame_name(frame))
+        running = bool(getattr(awaitable, "cr_running", False) or getattr(awaitable, "gi_running", False))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) \
+            or getattr(awaitable, "ag_await", None)
+    return ";".join(names), running
+
+
+@dataclass
+class UpdateRecord:
+    """Обновление, которое сейчас обрабатывается хэндлером."""
+    event: str
+    handler: str
+    router: str
+    update_id: int | None
+    task: asyncio.Task | None = None                  # задача, в которой обрабатывается обновление
+    started: float = field(default_factory=time.monotonic)
+    samples: Counter = field(default_factory=Counter)  # свёрнутый стек -> сколько раз встретился
+    duration: float = 0.0
+
+
+class UpdateProfiler:
+    """
+    Профилировщик обновлений, который можно держать включённым в продакшене.
+
+    - ProfilingMiddleware отмечает начало и конец обработки каждого обновления — это
+      запись в словарь, без профилировщика Python.
+    - Фоновый поток раз в PROFILE_SAMPLE_INTERVAL секунд смотрит на обновления:
+      пока какое-то из них обрабатывается дольше PROFILE_SLOW_SECONDS, он снимает стек
+      именно его задачи (сэмплирующий профиль): цепочку ожидающих корутин, а если задача
+      в этот момент выполняется — стек потока цикла событий. Так в профиль медленного
+      хэндлера не попадают ни селектор, ни чужие обновления. Обновление дольше порога сохраняется
+      в PROFILE_DIR вместе со снятыми стеками — не чаще раза в PROFILE_DUMP_COOLDOWN на хэндлер.
+    - Корутина-монитор измеряет задержку цикла событий. Если цикл не отвечает дольше
+      PROFILE_LOOP_BLOCK_SECONDS, тот же поток пишет в лог стек, на котором цикл завис,
+      и хэндлеры, обрабатывавшиеся в этот момент.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, slow_seconds: float = PROFILE_SLOW_SECONDS,
+                 interval: float = PROFILE_SAMPLE_INTERVAL, block_seconds: float = PROFILE_LOOP_BLOCK_SECONDS,
+                 cooldown: float = PROFILE_DUMP_COOLDOWN):
+        self.directory = directory
+        self.slow_seconds = slow_seconds
+        self.interval = interval
+        self.block_seconds = block_seconds
+        self.cooldown = cooldown
+        self._active: dict[int, UpdateRecord] = {}
+        self._ids = itertools.count()
+        self._dumps: queue.SimpleQueue = queue.SimpleQueue()  # записи для сохранения на диск (пишет поток)
+        self._last_dump: dict[str, float] = {}
+        self._loop_thread_id: int | None = None
+        self._heartbeat = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._monitor: asyncio.Task | None = None
+
+    # === Вызывается из цикла событий ===
+
+    def start(self):
+        """Запускает поток сэмплирования и монитор задержки цикла; вызывать из работающего цикла событий."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="update-profiler", daemon=True)
+        self._thread.start()
+        self._monitor = asyncio.create_task(self._monitor_loop())
+        logger.info(f"[PROFILE] Профилирование обновлений включено: порог {self.slow_seconds} с, дампы в {self.directory}")
+
+    async def stop(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+        self._stop.set()
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+
+    def begin(self, record: UpdateRecord) -> int:
+        key = next(self._ids)
+        self._active[key] = record
+        return key
+
+    def end(self, key: int):
+        record = self._active.pop(key)
+        record.duration = time.monotonic() - record.started
+        if record.duration < self.slow_seconds:
+            return
+        SLOW_UPDATES.inc(event=record.event, handler=record.handler)
+        now = time.monotonic()
+        if now - self._last_dump.get(record.handler, -self.cooldown) >= self.cooldown:
+            self._last_dump[record.handler] = now
+            self._dumps.put(record)
+
+    async def _monitor_loop(self):
+        """Раз в interval проверяет, насколько позже срока проснулся цикл событий."""
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - expected)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+            if lag >= self.block_seconds:
+                for handler in {r.handler for r in list(self._active.values())} or {"background"}:
+                    EVENT_LOOP_BLOCKS.inc(handler=handler)
+
+    # === Фоновый поток ===
+
+    def _run(self):
+        block_reported = False
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._loop_thread_id)
+            now = time.monotonic()
+
+            # цикл событий давно не отмечался — значит, его блокирует синхронный код
+            blocked = now - self._heartbeat - self.interval
+            if blocked >= self.block_seconds and not block_reported and frame is not None:
+                block_reported = True
+                handlers = ", ".join(sorted({r.handler for r in list(self._active.values())})) or "нет"
+                logger.warning(
+                    f"[PROFILE] Цикл событий заблокирован уже {blocked:.2f} с; хэндлеры в работе: {handlers}; "
+                    f"стек: {fold_stack(frame)}"
+                )
+            elif blocked < self.block_seconds:
+                block_reported = False
+
+            for record in [r for r in list(self._active.values()) if now - r.started >= self.slow_seconds]:
+                stack = self._sample(record, frame)
+                if stack:
+                    record.samples[stack] += 1
+            del frame
+
+            while not self._dumps.empty():
+                self._dump(self._dumps.get())
+
+        while not self._dumps.empty():
+            self._dump(self._dumps.get())
+
+    @staticmethod
+    def _sample(record: UpdateRecord, loop_frame) -> str | None:
+        """Стек, на котором сейчас находится обработка обновления."""
+        if record.task is None:
+            return None
+        try:
+            stack, running = fold_task(record.task)
+        except (AttributeError, RuntimeError):
+            # задача завершилась или меняется прямо сейчас — пропускаем сэмпл
+            return None
+        if running and loop_frame is not None:
+            return fold_stack(loop_frame)
+        return stack
+
+    def _dump(self, record: UpdateRecord):
+        name = f"{datetime.now():%Y%m%d-%H%M%S}_{record.event}_{record.handler}_{record.update_id or 0}.txt"
+        path = os.path.join(self.directory, name)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"# handler: {record.router}.{record.handler}\n")
+                f.write(f"# event: {record.event}, update_id: {record.update_id}\n")
+                f.write(f"# duration: {record.duration:.3f} s, samples: {sum(record.samples.values())} "
+                        f"every {self.interval} s after the first {self.slow_seconds} s\n")
+                for stack, count in record.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.warning(f"[PROFILE] Не удалось сохранить профиль {path}: {e}")
+            return
+        logger.warning(f"[PROFILE] Медленное обновление {record.event}/{record.handler}: "
+                       f"{record.duration:.2f} с, профиль: {path}")
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware aiogram: отмечает каждое обновление в UpdateProfiler.
+    Регистрируется на наблюдателях диспетчера, как и HandlerMetricsMiddleware.
+    """
+
+    def __init__(self, profiler: UpdateProfiler, event: str):
+        self.profiler = profiler
+        self.event = event
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        callback = getattr(data.get("handler"), "callback", None)
+        key = self.profiler.begin(UpdateRecord(
+            event=self.event,
+            handler=handler_name(data),
+            router=getattr(callback, "__module__", "unknown"),
+            update_id=getattr(data.get("event_update"), "update_id", None),
+            task=asyncio.current_task(),
+        ))
+        try:
+            return await handler(event, data)
+        finally:
+            self.profiler.end(key)
+
+
+# общий профилировщик процесса
+update_profiler = UpdateProfiler()
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import resource
+import signal
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import (
+    PYLINT_WORKERS,
+    PYLINT_QUEUE_SIZE,
+    PYLINT_TIMEOUT,
+    PYLINT_MEMORY_LIMIT_MB,
+    PYLINT_MAX_TASKS_PER_CHILD,
+    PYLINT_CACHE_SIZE,
+    PYLINT_CACHE_TTL,
+)
+from logger import logger
+from utils.cache import TTLCache, MISSING
+from utils.metrics import PYLINT_RUN_SECONDS, PYLINT_ERRORS, PYLINT_CACHE_HITS
+
+# флаги те же, что раньше передавались консольному pylint
+PYLINT_ARGS = ["--disable=all", "--enable=E,F,W,C,R", "--persistent=n"]
+# под этим именем код пользователя лежит в рабочем каталоге процесса,
+# чтобы вывод не зависел от случайного имени временного файла
+SNIPPET_FILE = "snippet.py"
+SNIPPET_MODULE = "snippet"
+# сообщения, которыми pylint сообщает о собственном падении при разборе или проверке кода
+FATAL_MESSAGES = ("(astroid-error)", "(fatal)")
+# путь к отчёту о падении, который pylint указывает в таком сообщении
+CRASH_REPORT_RE = re.compile(r"'([^']*pylint-crash[^']*\.txt)'")
+
+# сработал ли таймер текущей проверки (pylint перехватывает исключения сам, поэтому нужен флаг)
+_alarm_fired = False
+
+
+class PylintBusyError(Exception):
+    """Очередь проверок переполнена — новую задачу не принимаем."""
+
+
+def _init_worker(memory_limit_mb: int):
+    """
+    Инициализация рабочего процесса: ограничение памяти, отдельный каталог
+    для кода и заранее загруженный pylint, чтобы первая проверка не ждала импорта.
+    """
+    if memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    os.chdir(tempfile.mkdtemp(prefix="pylint-worker-"))
+    # пустая проверка загружает pylint и разбирает builtins в кэш astroid
+    _run_pylint("", PYLINT_TIMEOUT)
+
+
+def _on_alarm(signum, frame):
+    global _alarm_fired
+    _alarm_fired = True
+    raise TimeoutError("pylint не уложился в отведённое время")
+
+
+def _crash_error(report: str) -> Exception:
+    """
+    Исключение для отчёта, в котором pylint сообщил о своём падении (F0001/F0002).
+    Причину берём из отчёта о падении: MemoryError — упёрлись в RLIMIT_AS.
+    """
+    match = CRASH_REPORT_RE.search(report)
+    if match:
+        try:
+            with open(match.group(1), encoding="utf-8", errors="replace") as f:
+                crash = f.read()
+            os.remove(match.group(1))
+        except OSError:
+            crash = ""
+        if "MemoryError" in crash:
+            return MemoryError("pylint упёрся в лимит памяти")
+    return RuntimeError("pylint завершился с ошибкой при проверке кода")
+
+
+def _run_pylint(code: str, timeout: int) -> str:
+    """
+    Запускает pylint внутри рабочего процесса и возвращает текстовый отчёт.
+
+    pylint сам перехватывает исключения при проверке и превращает их в сообщение
+    astroid-error, поэтому таймаут и нехватка памяти определяются по флагу таймера
+    и отчёту о падении и пробрасываются как TimeoutError / MemoryError.
+    """
+    global _alarm_fired
+    from astroid import MANAGER
+    from pylint.lint import Run
+    from pylint.reporters.text import TextReporter
+
+    with open(SNIPPET_FILE, "w", encoding="utf-8") as f:
+        f.write(code)
+
+    output = io.StringIO()
+    _alarm_fired = False
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        Run([SNIPPET_FILE, *PYLINT_ARGS], reporter=TextReporter(output), exit=False)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        # astroid кэширует разобранные модули по имени — следующий код
+        # с тем же именем файла должен разбираться заново
+        MANAGER.astroid_cache.pop(SNIPPET_MODULE, None)
+
+    report = output.getvalue()
+    if _alarm_fired:
+        raise TimeoutError("pylint не уложился в отведённое время")
+    if any(message in report for message in FATAL_MESSAGES):
+        raise _crash_error(report)
+    return report
+
+
+def _warm_up():
+    """Пустая задача: заставляет пул поднять процессы и выполнить инициализацию."""
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+class PylintPool:
+    """
+    Пул постоянно запущенных процессов с pylint.
+
+    Вместо нового процесса на каждую проверку код уходит в один из прогретых
+    процессов; одинаковый код повторно не проверяется — результат берётся из кэша.
+    Число задач в работе и в очереди ограничено, сверх лимита бросается PylintBusyError.
+    """
+
+    def __init__(self, workers: int = PYLINT_WORKERS, queue_size: int = PYLINT_QUEUE_SIZE,
+                 timeout: int = PYLINT_TIMEOUT, memory_limit_mb: int = PYLINT_MEMORY_LIMIT_MB,
+                 max_tasks_per_child: int = PYLINT_MAX_TASKS_PER_CHILD):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_child = max_tasks_per_child
+        self.cache = TTLCache(PYLINT_CACHE_SIZE, PYLINT_CACHE_TTL)
+        self._executor = None
+        self._pending = 0
+        self._inflight = {}  # хэш кода -> future проверки, чтобы не гонять одинаковый код дважды
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: рабочие процессы не наследуют потоки и соединения бота
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.memory_limit_mb,),
+            max_tasks_per_child=self.max_tasks_per_child,
+        )
+
+    async def start(self):
+        """Поднимает рабочие процессы заранее, чтобы первая проверка не ждала запуска."""
+        if self._executor is None:
+            self._executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self._executor, _warm_up) for _ in range(self.workers))
+        )
+        logger.info(f"[Pylint] Пул запущен (до {self.workers} процессов)")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _restart(self):
+        logger.warning("[Pylint] Пул процессов сломан, перезапускаю")
+        self.shutdown()
+        self._executor = self._create_executor()
+
+    async def check(self, code: str) -> str:
+        """
+        Возвращает отчёт pylint для кода.
+        Бросает PylintBusyError при переполненной очереди, TimeoutError при превышении
+        времени, MemoryError, если проверка упёрлась в лимит памяти, и RuntimeError,
+        если pylint упал по другой причине. Неудачные проверки в кэш не попадают.
+        """
+        key = code_hash(code)
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            PYLINT_CACHE_HITS.inc()
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        if self._pending >= self.workers + self.queue_size:
+            PYLINT_ERRORS.inc(reason="busy")
+            raise PylintBusyError()
+
+        if self._executor is None:
+            self._executor = self._create_executor()
+
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        future = loop.run_in_executor(self._executor, _run_pylint, code, self.timeout)
+        self._inflight[key] = future
+        started = loop.time()
+        try:
+            # внутри процесса время ограничено сигналом, снаружи — с запасом на очередь
+            result = await asyncio.wait_for(
+                asyncio.shield(future), self.timeout * (1 + self._pending / self.workers) + 5
+            )
+        except BrokenProcessPool:
+            # процесс убит (например, OOM) — пул больше не принимает задачи
+            PYLINT_ERRORS.inc(reason="crash")
+            self._restart()
+            raise MemoryError("рабочий процесс pylint завершился аварийно")
+        except (TimeoutError, MemoryError, RuntimeError) as e:
+            PYLINT_ERRORS.inc(reason=type(e).__name__)
+            raise
+        finally:
+            PYLINT_RUN_SECONDS.observe(loop.time() - started)
+            self._pending -= 1
+            self._inflight.pop(key, None)
+
+        self.cache.set(key, result)
+        return result
+
+
+pylint_pool = PylintPool()
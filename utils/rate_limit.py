@@ -0,0 +1,127 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class TokenBucket:
+    """
+    Классический «ведро с токенами»: пополняется со скоростью rate токенов в секунду
+    и вмещает не больше capacity токенов (допустимый всплеск).
+
+    Токены можно брать «в долг» (reserve): баланс уходит в минус, а вызывающий
+    получает время, которое нужно подождать, — так конкурирующие запросы
+    выстраиваются друг за другом без активного опроса.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0  # до какого момента ведро заблокировано (например, после RetryAfter)
+
+    def _refill(self, now: float):
+        """Начисляет токены за время, прошедшее с последнего обращения."""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """
+        Возвращает, сколько секунд нужно подождать до появления свободного токена.
+        Токен при этом не расходуется.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self._blocked_until - now)
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self.rate)
+        return wait
+
+    def reserve(self) -> float:
+        """
+        Забирает токен (при необходимости — в долг).
+
+        Возвращает:
+            float: сколько секунд нужно подождать, прежде чем использовать токен
+        """
+        wait = self.delay()
+        self._tokens -= 1
+        return wait
+
+    def refund(self):
+        """Возвращает токен, взятый через reserve(), но так и не использованный (например, при отмене)."""
+        self._refill(time.monotonic())
+        self._tokens = min(self.capacity, self._tokens + 1)
+
+    def set_rate(self, rate: float):
+        """Меняет скорость пополнения; уже накопленные токены начисляются по старой скорости."""
+        self._refill(time.monotonic())
+        self.rate = rate
+
+    def block(self, seconds: float):
+        """
+        Блокирует ведро на указанное время и обнуляет накопленный запас,
+        чтобы после разблокировки не было резкого всплеска запросов.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = min(self._tokens, 0)
+
+    def is_idle(self) -> bool:
+        """Ведро полностью восстановилось и не заблокировано — его можно безопасно удалить."""
+        return self.delay() == 0 and self._tokens >= self.capacity
+
+
+class PriorityRateLimiter:
+    """
+    Ограничитель частоты поверх TokenBucket с очередью ожидания по приоритетам.
+
+    Когда токенов не хватает, запросы встают в кучу (priority, порядок прихода)
+    и получают токены строго по приоритету: меньшее число — выше приоритет.
+    Токены раздаёт одна фоновая задача, которая живёт, пока есть ожидающие.
+    """
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump_task: asyncio.Task | None = None
+
+    @property
+    def waiting(self) -> int:
+        """Количество запросов, ожидающих токен."""
+        return len(self._waiters)
+
+    async def acquire(self, priority: int = 0):
+        """
+        Ждёт свободный токен с учётом приоритета.
+
+        Параметры:
+            priority (int): приоритет запроса, 0 — наивысший
+        """
+        # быстрый путь: никто не ждёт и токен есть прямо сейчас
+        if not self._waiters and self.bucket.delay() == 0:
+            self.bucket.reserve()
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self):
+        """Раздаёт токены ожидающим по мере пополнения ведра."""
+        while self._waiters:
+            delay = self.bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            # ожидающий мог быть отменён, пока стоял в очереди
+            if future.done():
+                continue
+            self.bucket.reserve()
+            future.set_result(None)
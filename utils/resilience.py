@@ -0,0 +1,252 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, TypeVar
+
+import aiohttp
+
+from utils.rate_limit import TokenBucket, PriorityRateLimiter
+from utils.metrics import UPSTREAM_RETRIES, UPSTREAM_CIRCUIT_REJECTED, UPSTREAM_CIRCUIT_OPEN, UPSTREAM_RATE_LIMIT
+from logger import logger  # централизованный логгер
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Сервис признан недоступным: предохранитель разомкнут, запрос не выполнялся."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} временно недоступен, повтор через {retry_in:.0f} с")
+        self.retry_in = retry_in
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Ошибка говорит о перегрузке или недоступности сервиса, и запрос имеет смысл повторить:
+    429, 5xx, таймауты и обрывы соединения. Остальные 4xx — ошибка самого запроса.
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+
+
+def retry_after_seconds(error: BaseException) -> float | None:
+    """Значение заголовка Retry-After ответа (секунды или HTTP-дата); None — заголовка нет."""
+    headers = getattr(error, "headers", None)
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после failure_threshold неудач подряд размыкается на cooldown секунд,
+    и все запросы сразу завершаются CircuitOpenError, не нагружая больной сервис.
+
+    По истечении cooldown пропускается один пробный запрос (half-open):
+    удачный замыкает предохранитель, неудачный снова размыкает его на cooldown.
+
+    Сервис может и сам попросить не обращаться к нему дольше (Retry-After) —
+    тогда предохранитель размыкается на этот срок (trip).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._open_for = cooldown
+        self._probing = False
+
+    def retry_in(self) -> float:
+        """Через сколько секунд предохранитель пропустит пробный запрос."""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self._open_for - time.monotonic())
+
+    def allow(self) -> bool:
+        """Можно ли выполнять запрос прямо сейчас."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if self.retry_in() > 0:
+                return False
+            self.state = self.HALF_OPEN
+            self._probing = False
+        # half-open: пропускаем только один пробный запрос
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> bool:
+        """Учитывает неудачу; возвращает True, если предохранитель только что разомкнулся."""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            return self.trip(self.cooldown)
+        return False
+
+    def trip(self, seconds: float) -> bool:
+        """Размыкает предохранитель на seconds секунд; возвращает True, если он был замкнут."""
+        opened = self.state != self.OPEN
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._open_for = seconds if opened else max(seconds, self.retry_in())
+        self._probing = False
+        return opened
+
+    def release(self):
+        """Пробный запрос не дал ответа (например, отменён) — следующий запрос станет новой пробой."""
+        self._probing = False
+
+
+class AdaptiveRateLimiter:
+    """
+    Ограничитель темпа запросов, подстраивающийся под ответы сервиса (AIMD):
+    на каждый 429 темп уменьшается вдвое (не ниже min_rate), а ведро блокируется
+    на Retry-After, но не дольше max_block; каждый удачный запрос возвращает темп на step запросов/с, до max_rate.
+
+    Ожидающие запросы получают токены по приоритету (см. PriorityRateLimiter).
+    """
+
+    def __init__(self, max_rate: float, min_rate: float, step: float, max_block: float):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.step = step
+        self.max_block = max_block
+        self.bucket = TokenBucket(max_rate, max_rate)
+        self._limiter = PriorityRateLimiter(self.bucket)
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    async def acquire(self, priority: int = 0):
+        await self._limiter.acquire(priority)
+
+    def on_success(self):
+        if self.bucket.rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.step))
+
+    def on_throttled(self, retry_after: float | None):
+        self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+        wait = retry_after if retry_after is not None else 1 / self.bucket.rate
+        # дольше ждать в очереди ведра никто не должен: такой Retry-After размыкает предохранитель
+        self.bucket.block(min(wait, self.max_block))
+
+
+class ResiliencePolicy:
+    """
+    Общая политика вызовов внешнего HTTP-сервиса: адаптивный ограничитель темпа,
+    повторы идемпотентных запросов с экспоненциальной паузой и случайным разбросом
+    (full jitter) и предохранитель.
+
+    - Повторяются только ошибки перегрузки/недоступности (см. is_retryable).
+    - Retry-After длиннее max_delay не пережидается: ошибка сразу уходит вызывающему,
+      а предохранитель размыкается на весь Retry-After, чтобы остальные вызовы
+      сразу получали CircuitOpenError, а не ждали в очереди ограничителя.
+    - Пока предохранитель разомкнут, вызовы сразу завершаются CircuitOpenError.
+
+    Один экземпляр на сервис — так все его клиенты (планировщик, хэндлеры)
+    видят одно и то же состояние сервиса.
+    """
+
+    def __init__(self, name: str, limiter: AdaptiveRateLimiter, breaker: CircuitBreaker,
+                 attempts: int, base_delay: float, max_delay: float):
+        self.name = name
+        self.limiter = limiter
+        self.breaker = breaker
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._update_gauges()
+
+    def backoff(self, attempt: int) -> float:
+        """Пауза перед повтором номер attempt (с 1): случайная от 0 до base_delay * 2^(attempt-1)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _update_gauges(self):
+        UPSTREAM_CIRCUIT_OPEN.set(1 if self.breaker.state == CircuitBreaker.OPEN else 0, service=self.name)
+        UPSTREAM_RATE_LIMIT.set(self.limiter.rate, service=self.name)
+
+    async def call(self, request: Callable[[], Awaitable[T]], priority: int = 0, attempts: int | None = None) -> T:
+        """
+        Выполняет запрос по политике.
+
+        Параметры:
+            request: корутинная функция без аргументов, выполняющая одну попытку запроса
+            priority (int): приоритет в очереди ограничителя, 0 — наивысший
+            attempts (int | None): сколько всего попыток; None — значение политики
+
+        Исключения:
+            CircuitOpenError: предохранитель разомкнут
+            ошибка последней попытки — если повторы не помогли или ошибка не повторяемая
+        """
+        attempts = attempts or self.attempts
+        last_error = None
+        for attempt in range(1, attempts + 1):
+            if not self.breaker.allow():
+                UPSTREAM_CIRCUIT_REJECTED.inc(service=self.name)
+                raise CircuitOpenError(self.name, self.breaker.retry_in()) from last_error
+
+            await self.limiter.acquire(priority)
+            try:
+                result = await request()
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # сервис ответил — значит, он жив; ошибка в самом запросе
+                    self.breaker.record_success()
+                    self._update_gauges()
+                    raise
+                last_error = e
+                wait = retry_after_seconds(e)
+                throttled = isinstance(e, aiohttp.ClientResponseError) and e.status == 429
+                if throttled:
+                    self.limiter.on_throttled(wait)
+                too_long = wait is not None and wait > self.max_delay
+                opened = self.breaker.trip(wait) if too_long else self.breaker.record_failure()
+                if opened:
+                    logger.warning(
+                        f"[{self.name.upper()}] Предохранитель разомкнут на {self.breaker.retry_in():.0f} с: {e!r}"
+                    )
+                self._update_gauges()
+
+                if attempt == attempts or too_long:
+                    raise
+                reason = "429" if throttled else type(e).__name__
+                UPSTREAM_RETRIES.inc(service=self.name, reason=reason)
+                # после 429 паузу выдерживает ограничитель, заблокированный на Retry-After
+                delay = 0.0 if throttled else (wait if wait is not None else self.backoff(attempt))
+                logger.warning(
+                    f"[{self.name.upper()}] Ошибка {e!r}, повтор {attempt}/{attempts - 1} через {delay:.1f} с"
+                )
+                if delay:
+                    await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                self.limiter.on_success()
+                self._update_gauges()
+                return result
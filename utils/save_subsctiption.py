@@ -1,7 +1,9 @@
-from db import subscriptions_collection
+from datetime import datetime, timezone
+from db import insert_subscription
+from jobs.leases import shard_of
 from logger import logger  # централизованный логгер приложения
 
-def save_subscription(subscription: dict):
+async def save_subscription(subscription: dict):
     """
     Сохраняет новую подписку в базу данных.
 
@@ -18,9 +20,14 @@ def save_subscription(subscription: dict):
         logger.error("Ошибка сохранения подписки: user_id отсутствует в данных")
         raise ValueError("user_id обязателен")
 
+    # новая подписка сразу попадает в ближайшую рассылку
+    subscription.setdefault("next_due", datetime.now(timezone.utc))
+    # шард определяет, какой экземпляр бота будет рассылать подписку
+    subscription["shard"] = shard_of(user_id)
+
     try:
         # Вставляем подписку в коллекцию MongoDB
-        subscriptions_collection.insert_one(subscription)
+        await insert_subscription(subscription)
         logger.info(f"[Subscriptions] Подписка сохранена для пользователя {user_id}")
     except Exception as e:
         # Логируем ошибку вставки, не поднимаем исключение выше
@@ -0,0 +1,86 @@
+import time
+from typing import Awaitable, TypeVar
+
+from aiohttp import web
+
+from utils.metrics import STARTUP_PHASE_SECONDS, BOT_READY
+from logger import logger  # централизованный логгер
+
+T = TypeVar("T")
+
+
+class Startup:
+    """
+    Фазы запуска бота и его готовность.
+
+    Фазы (импорты, MongoDB, пул pylint, команды бота, приём апдейтов) выполняются
+    по возможности параллельно; для каждой запоминается длительность.
+    Бот считается готовым, когда завершились все обязательные фазы (required).
+    Состояние отдаётся на эндпоинте /ready сервера метрик.
+    """
+
+    def __init__(self, required: tuple[str, ...] = ("mongo", "updates")):
+        self.required = set(required)
+        self.started_at = time.monotonic()
+        self.phases: dict[str, float] = {}  # фаза -> длительность, секунды
+        self.failed: dict[str, str] = {}    # фаза -> ошибка
+        self.ready_at: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def begin(self, started_at: float):
+        """Отсчитывает запуск от started_at (начало импортов main.py) и записывает фазу imports."""
+        self.started_at = started_at
+        self.record("imports", time.monotonic() - started_at)
+
+    def record(self, phase: str, seconds: float):
+        self.phases[phase] = seconds
+        STARTUP_PHASE_SECONDS.set(seconds, phase=phase)
+        logger.debug(f"[STARTUP] {phase}: {seconds:.3f} с")
+        if self.ready_at is None and self.required <= self.phases.keys():
+            self.ready_at = time.monotonic()
+            BOT_READY.set(1)
+            phases = ", ".join(f"{name} {value:.2f} с" for name, value in self.phases.items())
+            logger.info(f"[STARTUP] Бот готов через {self.ready_at - self.started_at:.2f} с после запуска ({phases})")
+
+    def mark(self, phase: str):
+        """Записывает фазу, длительность которой — время от начала запуска."""
+        self.record(phase, time.monotonic() - self.started_at)
+
+    async def run(self, phase: str, awaitable: Awaitable[T], required: bool = True) -> T | None:
+        """
+        Выполняет фазу запуска и записывает её длительность.
+        Ошибка обязательной фазы пробрасывается, необязательной — только логируется.
+        """
+        started = time.monotonic()
+        try:
+            result = await awaitable
+        except Exception as e:
+            self.failed[phase] = repr(e)
+            logger.exception(f"[STARTUP] Фаза {phase} завершилась ошибкой: {e}")
+            if required:
+                raise
+            return None
+        self.record(phase, time.monotonic() - started)
+        return result
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "uptime": round(time.monotonic() - self.started_at, 3),
+            "ready_after": round(self.ready_at - self.started_at, 3) if self.ready else None,
+            "phases": {name: round(value, 3) for name, value in self.phases.items()},
+            "pending": sorted(self.required - self.phases.keys()),
+            "failed": self.failed,
+        }
+
+
+async def handle_ready(request: web.Request) -> web.Response:
+    """Проверка готовности для оркестратора: 200, когда бот готов, иначе 503; в теле — фазы запуска."""
+    return web.json_response(startup.status(), status=200 if startup.ready else 503)
+
+
+# состояние запуска процесса
+startup = Startup()
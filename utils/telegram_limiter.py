@@ -0,0 +1,148 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage, EditMessageText, ForwardMessage, Response, SendDocument, SendMessage, SendPhoto, TelegramMethod,
+)
+
+from config import (
+    TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST, TG_GROUP_RATE, TG_CHAT_BUCKETS_MAX, TG_MAX_RETRIES,
+)
+from utils.rate_limit import TokenBucket, PriorityRateLimiter
+from utils.metrics import (
+    track, TG_SEND_SECONDS, TG_SEND_ERRORS, TG_LIMITER_WAIT_SECONDS, TG_RETRY_AFTER,
+)
+from logger import logger  # централизованный логгер
+
+# приоритеты отправки: ответы пользователю идут раньше плановой рассылки
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BROADCAST = 1
+
+# приоритет отправки для текущей задачи; фоновая рассылка выставляет PRIORITY_BROADCAST у себя
+send_priority: ContextVar[int] = ContextVar("send_priority", default=PRIORITY_INTERACTIVE)
+
+# методы API, которые Telegram учитывает в лимитах на отправку сообщений
+THROTTLED_METHODS = (SendMessage, EditMessageText, SendPhoto, SendDocument, CopyMessage, ForwardMessage)
+
+
+class TelegramSendLimiter:
+    """
+    Ограничитель отправки сообщений в Telegram:
+    общее ведро токенов на бота (~30 сообщений/с) и отдельное ведро на каждый чат
+    (~1 сообщение/с в личный чат, 20 в минуту в группу).
+
+    Flood control (RetryAfter) в Telegram часто действует на весь бот, поэтому после него
+    приостанавливается не только чат, но и вся плановая рассылка (PRIORITY_BROADCAST);
+    ответы на команды пользователей в другие чаты продолжают уходить.
+    """
+
+    def __init__(self):
+        self._global = PriorityRateLimiter(TokenBucket(TG_GLOBAL_RATE, TG_GLOBAL_RATE))
+        # ведра чатов в порядке последнего использования — для вытеснения самых старых
+        self._chats: OrderedDict[int | str, TokenBucket] = OrderedDict()
+        self._broadcast_paused_until = 0.0  # до какого момента (time.monotonic) рассылка приостановлена
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        """Возвращает ведро токенов чата, создавая его при первом обращении."""
+        bucket = self._chats.get(chat_id)
+        if bucket is not None:
+            self._chats.move_to_end(chat_id)
+            return bucket
+
+        # отрицательные id — группы и каналы, у них лимит строже
+        is_group = isinstance(chat_id, str) or chat_id < 0
+        bucket = TokenBucket(TG_GROUP_RATE, 1) if is_group else TokenBucket(TG_CHAT_RATE, TG_CHAT_BURST)
+        self._chats[chat_id] = bucket
+
+        # вытесняем давно неиспользуемые чаты; «простаивающее» ведро равносильно новому
+        if len(self._chats) > TG_CHAT_BUCKETS_MAX:
+            oldest_id, oldest = next(iter(self._chats.items()))
+            if oldest.is_idle():
+                del self._chats[oldest_id]
+            else:
+                self._chats.move_to_end(oldest_id)
+        return bucket
+
+    async def acquire(self, chat_id: int | str | None, priority: int = PRIORITY_INTERACTIVE):
+        """
+        Ждёт, пока отправка в чат станет допустимой по обоим лимитам.
+
+        Параметры:
+            chat_id (int | str | None): чат получателя; None — только общий лимит
+            priority (int): приоритет отправки (PRIORITY_INTERACTIVE или PRIORITY_BROADCAST)
+        """
+        if priority != PRIORITY_INTERACTIVE:
+            while (pause := self._broadcast_paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(pause)
+        if chat_id is None:
+            await self._global.acquire(priority)
+            return
+
+        bucket = self._chat_bucket(chat_id)
+        delay = bucket.reserve()
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._global.acquire(priority)
+        except asyncio.CancelledError:
+            # отправки не будет — токен чата возвращаем, иначе чат потеряет его до пополнения
+            bucket.refund()
+            raise
+
+    def retry_after(self, chat_id: int | str | None, seconds: float):
+        """
+        Учитывает ответ RetryAfter от Telegram: приостанавливает на указанное время отправку
+        в этот чат и всю плановую рассылку; ответы на команды в другие чаты не ждут.
+        Если запрос не относится к конкретному чату, блокируется общее ведро.
+        """
+        self._broadcast_paused_until = max(self._broadcast_paused_until, time.monotonic() + seconds)
+        if chat_id is None:
+            self._global.bucket.block(seconds)
+        else:
+            self._chat_bucket(chat_id).block(seconds)
+
+
+class ThrottlingRequestMiddleware(BaseRequestMiddleware):
+    """
+    Middleware HTTP-сессии бота: пропускает все отправки сообщений через TelegramSendLimiter
+    и автоматически повторяет запрос после RetryAfter.
+
+    Подключается один раз к bot.session, поэтому действует и на хэндлеры (message.answer),
+    и на фоновую рассылку (bot.send_message).
+    """
+
+    def __init__(self, limiter: TelegramSendLimiter):
+        self.limiter = limiter
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Response:
+        if not isinstance(method, THROTTLED_METHODS):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        priority = send_priority.get()
+        method_name = type(method).__name__
+        for attempt in range(TG_MAX_RETRIES + 1):
+            with track(TG_LIMITER_WAIT_SECONDS, priority=priority):
+                await self.limiter.acquire(chat_id, priority)
+            try:
+                with track(TG_SEND_SECONDS, TG_SEND_ERRORS, method=method_name):
+                    return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                TG_RETRY_AFTER.inc()
+                if attempt == TG_MAX_RETRIES:
+                    raise
+                logger.warning(
+                    f"[TG] Flood control для чата {chat_id}: пауза {e.retry_after} с "
+                    f"(попытка {attempt + 1}/{TG_MAX_RETRIES})"
+                )
+                self.limiter.retry_after(chat_id, e.retry_after)
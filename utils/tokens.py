@@ -0,0 +1,40 @@
+import re
+
+# токен — слово из букв (латиница, кириллица), цифр и символов + и # (c++, c#)
+TOKEN_RE = re.compile(r"[0-9a-zа-яё+#]+")
+
+# hh.ru подсвечивает совпадения в сниппетах тегом <highlighttext>
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def tokenize(text: str | None) -> set[str]:
+    """
+    Разбивает текст на множество нормализованных токенов (нижний регистр, без тегов).
+
+    Параметры:
+        text (str | None): произвольный текст
+
+    Возвращает:
+        set[str]: уникальные токены
+    """
+    if not text:
+        return set()
+    return set(TOKEN_RE.findall(TAG_RE.sub(" ", text.lower()).replace("ё", "е")))
+
+
+def vacancy_tokens(item: dict) -> set[str]:
+    """
+    Возвращает токены вакансии из ответа поиска hh.ru: название и сниппет (требования, обязанности).
+
+    Параметры:
+        item (dict): вакансия из поля items ответа API
+
+    Возвращает:
+        set[str]: уникальные токены вакансии
+    """
+    snippet = item.get("snippet") or {}
+    return (
+        tokenize(item.get("name"))
+        | tokenize(snippet.get("requirement"))
+        | tokenize(snippet.get("responsibility"))
+    )
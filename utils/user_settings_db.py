@@ -1,46 +1,71 @@
-from db import user_settings_collection
-from pymongo import ReturnDocument
+from db import find_user_settings, upsert_user_settings
+from config import SETTINGS_CACHE_SIZE, SETTINGS_CACHE_TTL
+from utils.cache import TTLCache, MISSING
+from utils.metrics import track_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# кэш настроек: user_id -> документ настроек; обновляется при каждой записи (write-through)
+settings_cache = TTLCache(maxsize=SETTINGS_CACHE_SIZE, ttl=SETTINGS_CACHE_TTL)
+track_cache("settings", settings_cache)
+
+# счётчик записей: чтение, во время которого прошла запись, не кладёт в кэш возможно устаревший документ
+_writes = 0
+
+
+def default_settings(user_id: int) -> dict:
+    """возвращает настройки по умолчанию для пользователя, у которого их ещё нет"""
+    return {"user_id": user_id, "city_id": None, "level": None}
+
+
 async def get_user_settings(user_id: int) -> dict:
     """
-    получает настройки пользователя из базы данных по user_id
+    получает настройки пользователя по user_id — сначала из кэша, при промахе из базы данных
 
     :param user_id: уникальный идентификатор пользователя
     :return: словарь с настройками пользователя (если нет в базе — возвращает значения по умолчанию)
     """
+    cached = settings_cache.get(user_id)
+    if cached is not MISSING:
+        # отдаём копию, чтобы вызывающий код не мог испортить запись в кэше
+        return dict(cached)
+
+    writes_before = _writes
     try:
         # пытаемся найти документ с настройками пользователя
-        doc = user_settings_collection.find_one({"user_id": user_id})
+        doc = await find_user_settings(user_id)
         if doc:
-            logger.info(f"Настройки пользователя {user_id} успешно загружены")
-            return doc
+            logger.debug(f"Настройки пользователя {user_id} загружены из базы")
         else:
-            logger.info(f"Настройки пользователя {user_id} не найдены, возвращаем значения по умолчанию")
-            return {"user_id": user_id, "city_id": None, "level": None}
+            logger.debug(f"Настройки пользователя {user_id} не найдены, возвращаем значения по умолчанию")
+            doc = default_settings(user_id)
+        # кэшируем и отсутствие настроек: таких пользователей большинство
+        if writes_before == _writes:
+            settings_cache.set(user_id, doc)
+        return dict(doc)
     except Exception as e:
         logger.error(f"Ошибка при получении настроек пользователя {user_id}: {e}")
-        # возвращаем значения по умолчанию при ошибке чтения
-        return {"user_id": user_id, "city_id": None, "level": None}
+        # возвращаем значения по умолчанию при ошибке чтения (в кэш их не кладём)
+        return default_settings(user_id)
 
 async def update_user_settings(user_id: int, **kwargs):
     """
-    обновляет настройки пользователя в базе данных или создаёт новый документ, если его нет
+    обновляет настройки пользователя в базе данных или создаёт новый документ, если его нет;
+    обновлённый документ сразу попадает в кэш
 
     :param user_id: уникальный идентификатор пользователя
     :param kwargs: ключевые параметры для обновления (например, city_id, level)
     """
+    global _writes
+    _writes += 1
     try:
-        result = user_settings_collection.find_one_and_update(
-            {"user_id": user_id},
-            {"$set": kwargs},
-            upsert=True,
-            return_document=ReturnDocument.AFTER
-        )
+        result = await upsert_user_settings(user_id, kwargs)
+        settings_cache.set(user_id, result)
         logger.info(f"Настройки пользователя {user_id} обновлены: {kwargs}")
         return result
     except Exception as e:
+        # запись могла частично примениться — сбрасываем кэш, чтобы следующее чтение пошло в базу
+        settings_cache.invalidate(user_id)
         # Логируем ошибку вставки, не поднимаем исключение выше
         logger.error(f"Ошибка при обновлении настроек пользователя {user_id}: {e}")
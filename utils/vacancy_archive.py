@@ -0,0 +1,316 @@
+import asyncio
+import os
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+from config import (
+    ARCHIVE_DIR, ARCHIVE_FLUSH_ROWS, ARCHIVE_FLUSH_SECONDS, ARCHIVE_OPEN_PARTITIONS, ARCHIVE_TRENDS_DAYS,
+    ARCHIVE_TRENDS_TOP,
+)
+from utils.hh_api import parse_published_at
+from utils.tokens import tokenize, vacancy_tokens
+from logger import logger  # централизованный логгер
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# numpy импортируется внутри функций: он нужен только при записи архива и расчёте трендов,
+# а не при запуске бота
+
+# колонки строк архива: имя файла -> тип numpy (little-endian); все файлы партиции содержат одинаковое число значений
+ROW_COLUMNS = {
+    "id": "<u8",           # id вакансии hh.ru
+    "area": "<u4",         # id региона hh.ru
+    "published": "<i8",    # время публикации, unix-секунды
+    "salary_from": "<f4",  # вилка в рублях; NaN — не указана или в другой валюте
+    "salary_to": "<f4",
+}
+# токены хранятся плоско: хэш токена и номер строки (в пределах партиции), которой он принадлежит
+TOKEN_COLUMNS = {
+    "token": "<u4",
+    "token_row": "<u4",
+}
+WEEK = 7 * 24 * 3600
+
+
+def token_hash(token: str) -> int:
+    """Стабильный 32-битный хэш токена: одинаковый между запусками и процессами."""
+    return zlib.crc32(token.encode())
+
+
+def partition_name(moment: datetime) -> str:
+    """Партиция архива — день публикации вакансии (UTC)."""
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _rub(value, currency) -> float:
+    return float(value) if value and currency == "RUR" else float("nan")
+
+
+def archive_row(item: dict) -> tuple | None:
+    """
+    Преобразует вакансию из ответа hh.ru в строку архива:
+    (партиция, id, регион, время публикации, зарплата от, зарплата до, хэши токенов).
+    Вакансии без даты публикации или с нечисловыми id не архивируются.
+    """
+    published_at = parse_published_at(item)
+    area = (item.get("area") or {}).get("id")
+    if published_at is None or not str(item.get("id", "")).isdigit() or not str(area or "").isdigit():
+        return None
+    salary = item.get("salary") or {}
+    currency = salary.get("currency")
+    return (
+        partition_name(published_at),
+        int(item["id"]),
+        int(area),
+        int(published_at.timestamp()),
+        _rub(salary.get("from"), currency),
+        _rub(salary.get("to"), currency),
+        sorted({token_hash(t) for t in vacancy_tokens(item)}),
+    )
+
+
+def _itemsize(dtype: str) -> int:
+    return int(dtype[2:])
+
+
+def _column_path(directory: str, name: str, dtype: str) -> str:
+    return os.path.join(directory, f"{name}.{dtype[1:]}")
+
+
+def _length(path: str, dtype: str) -> int:
+    """Сколько значений типа dtype лежит в файле колонки (0 — файла нет)."""
+    return os.path.getsize(path) // _itemsize(dtype) if os.path.exists(path) else 0
+
+
+def _map(path: str, dtype: str, length: int) -> "np.ndarray":
+    """
+    Отображает первые length значений колонки в память только для чтения.
+    Возвращается обычный ndarray поверх отображения: индексирование np.memmap заметно медленнее.
+    """
+    import numpy as np
+
+    if length == 0:
+        return np.empty(0, dtype=dtype)
+    return np.asarray(np.memmap(path, dtype=dtype, mode="r", shape=(length,)))
+
+
+def read_partition(directory: str) -> dict[str, "np.ndarray"]:
+    """
+    Открывает партицию архива через memory map.
+
+    Если процесс упал посреди дозаписи, колонки могут оказаться разной длины —
+    тогда берётся общая (минимальная) длина, а «лишние» значения игнорируются.
+    """
+    import numpy as np
+
+    paths = {name: _column_path(directory, name, dtype) for name, dtype in (ROW_COLUMNS | TOKEN_COLUMNS).items()}
+    rows = min(_length(paths[name], dtype) for name, dtype in ROW_COLUMNS.items())
+    columns = {name: _map(paths[name], dtype, rows) for name, dtype in ROW_COLUMNS.items()}
+
+    tokens = min(_length(paths[name], dtype) for name, dtype in TOKEN_COLUMNS.items())
+    token = _map(paths["token"], TOKEN_COLUMNS["token"], tokens)
+    token_row = _map(paths["token_row"], TOKEN_COLUMNS["token_row"], tokens)
+    # token_row не убывает — токены строк за пределами общей длины отрезаются одним поиском
+    keep = int(np.searchsorted(token_row, rows))
+    columns["token"], columns["token_row"] = token[:keep], token_row[:keep]
+    columns["rows"] = rows
+    return columns
+
+
+@dataclass
+class CityTrend:
+    area: int
+    total: int           # вакансий за весь период
+    this_week: int       # за последние 7 дней
+    prev_week: int       # за 7 дней до этого
+    salary: tuple[float, float, float] | None  # 25-й, 50-й и 75-й перцентили зарплаты за период, рубли
+
+
+class VacancyArchive:
+    """
+    Колоночный архив вакансий на диске, только на дозапись.
+
+    - Каталог на каждый день публикации (ARCHIVE_DIR/2026-10-18/), в нём по файлу
+      на колонку (id.u8, area.u4, published.i8, salary_from.f4, salary_to.f4, token.u4, token_row.u4).
+      Файлы — «голые» массивы numpy, поэтому читаются через memory map без разбора.
+    - Вакансии копятся в памяти как есть и дописываются в файлы в отдельном потоке, когда набралось
+      ARCHIVE_FLUSH_ROWS вакансий или прошло ARCHIVE_FLUSH_SECONDS секунд. Разбор вакансий в строки
+      (даты, токены) тоже выполняется в этом потоке, а не в цикле событий.
+    - Одна и та же вакансия (по id в пределах дня публикации) попадает в архив один раз.
+    """
+
+    def __init__(self, root: str = ARCHIVE_DIR, flush_rows: int = ARCHIVE_FLUSH_ROWS,
+                 flush_seconds: float = ARCHIVE_FLUSH_SECONDS, open_partitions: int = ARCHIVE_OPEN_PARTITIONS):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.open_partitions = open_partitions
+        self._buffer: list[dict] = []  # вакансии из ответов hh.ru, ещё не разобранные в строки
+        self._last_flush = time.monotonic()
+        # id уже записанных вакансий для недавно использованных партиций (LRU); трогает только поток записи
+        self._seen: OrderedDict[str, set[int]] = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+
+    def add(self, items: list[dict]):
+        """Добавляет вакансии из ответа hh.ru в буфер; при заполнении буфера запускает запись в фоне."""
+        self._buffer.extend(items)
+        due = len(self._buffer) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_seconds
+        if due and self._buffer and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """Дописывает накопленные строки на диск."""
+        async with self._lock:
+            buffer, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if not buffer:
+                return
+            try:
+                written = await asyncio.to_thread(self._write, buffer)
+            except Exception as e:
+                logger.exception(f"[ARCHIVE] Не удалось записать вакансии в архив: {e}")
+                return
+            logger.debug(f"[ARCHIVE] В архив записано вакансий: {written}")
+
+    async def close(self):
+        """Записывает остаток буфера при остановке бота."""
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
+
+    def _open(self, name: str) -> tuple[str, set[int], int]:
+        """
+        Готовит партицию к дозаписи: обрезает колонки до общей длины (после падения
+        посреди записи) и загружает id уже записанных вакансий.
+        """
+        directory = os.path.join(self.root, name)
+        os.makedirs(directory, exist_ok=True)
+        columns = read_partition(directory)
+        rows, tokens = columns["rows"], len(columns["token"])
+        seen = self._seen.get(name)
+        if seen is None:
+            seen = set(columns["id"].tolist())
+        # отображения закрываем до обрезки файлов
+        del columns
+        for names, length in ((ROW_COLUMNS, rows), (TOKEN_COLUMNS, tokens)):
+            for column, dtype in names.items():
+                path = _column_path(directory, column, dtype)
+                if os.path.exists(path) and os.path.getsize(path) != length * _itemsize(dtype):
+                    logger.warning(f"[ARCHIVE] {path}: недописанные данные отброшены")
+                    os.truncate(path, length * _itemsize(dtype))
+
+        self._seen[name] = seen
+        self._seen.move_to_end(name)
+        while len(self._seen) > self.open_partitions:
+            self._seen.popitem(last=False)
+        return directory, seen, rows
+
+    def _write(self, items: list[dict]) -> int:
+        import numpy as np
+
+        # строки по партициям; повторы одной вакансии в буфере схлопываются по id
+        partitions: dict[str, dict[int, tuple]] = {}
+        for item in items:
+            row = archive_row(item)
+            if row is not None:
+                partitions.setdefault(row[0], {}).setdefault(row[1], row)
+
+        written = 0
+        for name, rows in partitions.items():
+            directory, seen, start = self._open(name)
+            rows = [row for vacancy_id, row in rows.items() if vacancy_id not in seen]
+            if not rows:
+                continue
+
+            arrays = {
+                name: np.array([row[i] for row in rows], dtype=ROW_COLUMNS[name])
+                for i, name in enumerate(ROW_COLUMNS, start=1)
+            }
+            arrays["token"] = np.array([h for row in rows for h in row[6]], dtype=TOKEN_COLUMNS["token"])
+            arrays["token_row"] = np.repeat(
+                np.arange(start, start + len(rows), dtype=TOKEN_COLUMNS["token_row"]), [len(row[6]) for row in rows]
+            )
+            # сначала токены, потом строки: строка без токенов при чтении не видна, а лишние токены отсекаются
+            for column, dtype in (*TOKEN_COLUMNS.items(), *ROW_COLUMNS.items()):
+                with open(_column_path(directory, column, dtype), "ab") as f:
+                    f.write(arrays[column].tobytes())
+            seen.update(row[1] for row in rows)
+            written += len(rows)
+        return written
+
+    def trends(self, keyword: str | None, now: datetime, days: int = ARCHIVE_TRENDS_DAYS,
+               top: int = ARCHIVE_TRENDS_TOP) -> list[CityTrend]:
+        """
+        Считает по архиву статистику вакансий с ключевым словом по регионам.
+
+        Все расчёты — векторные операции numpy над отображёнными в память колонками,
+        поэтому даже месяцы данных обрабатываются за миллисекунды. Блокирующий вызов:
+        из обработчиков запускать через asyncio.to_thread.
+
+        Параметры:
+            keyword (str | None): ключевые слова; вакансия должна содержать все их токены. None — все вакансии
+            now (datetime): конец периода
+            days (int): длина периода, дни
+            top (int): сколько регионов с наибольшим числом вакансий за неделю вернуть
+
+        Возвращает:
+            list[CityTrend]: регионы по убыванию числа вакансий за последнюю неделю
+        """
+        import numpy as np
+
+        wanted = np.array(sorted({token_hash(t) for t in tokenize(keyword)}), dtype=TOKEN_COLUMNS["token"])
+        areas, published, salaries = [], [], []
+        for offset in range(days + 1):
+            directory = os.path.join(self.root, partition_name(now - timedelta(days=offset)))
+            if not os.path.isdir(directory):
+                continue
+            columns = read_partition(directory)
+            if not columns["rows"]:
+                continue
+            if len(wanted):
+                # строка подходит, если у неё совпали все токены запроса (токены строки уникальны)
+                hits = np.bincount(columns["token_row"][np.isin(columns["token"], wanted)], minlength=columns["rows"])
+                mask = hits == len(wanted)
+            else:
+                mask = np.ones(columns["rows"], dtype=bool)
+            if not mask.any():
+                continue
+            areas.append(columns["area"][mask])
+            published.append(columns["published"][mask])
+            low, high = columns["salary_from"][mask], columns["salary_to"][mask]
+            # середина вилки; если указана только одна граница — она
+            salaries.append(np.where(np.isnan(low), high, np.where(np.isnan(high), low, (low + high) / 2)))
+
+        if not areas:
+            return []
+        area, published, salary = np.concatenate(areas), np.concatenate(published), np.concatenate(salaries)
+        end = int(now.timestamp())
+        in_period = published >= end - days * 24 * 3600
+        area, published, salary = area[in_period], published[in_period], salary[in_period]
+
+        # id регионов hh.ru — небольшие числа, поэтому группировка по региону — это просто bincount
+        total = np.bincount(area)
+        this_week = np.bincount(area, weights=published >= end - WEEK, minlength=len(total)).astype(int)
+        prev_week = np.bincount(
+            area, weights=(published >= end - 2 * WEEK) & (published < end - WEEK), minlength=len(total)
+        ).astype(int)
+
+        cities = np.flatnonzero(total)
+        order = cities[np.lexsort((-total[cities], -this_week[cities]))][:top]
+        has_salary = ~np.isnan(salary)
+        result = []
+        for city in order:
+            city_salary = salary[(area == city) & has_salary]
+            percentiles = tuple(float(v) for v in np.percentile(city_salary, (25, 50, 75))) if len(city_salary) else None
+            result.append(CityTrend(int(city), int(total[city]), int(this_week[city]), int(prev_week[city]), percentiles))
+        return result
+
+
+# общий архив процесса: его пополняют планировщик, локальное сопоставление и /vacancies, читает команда /trends
+vacancy_archive = VacancyArchive()
@@ -0,0 +1,89 @@
+import asyncio
+import signal
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import (
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_WORKERS,
+    WEBHOOK_DRAIN_TIMEOUT,
+)
+from logger import logger
+
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик вебхука Telegram.
+
+    Отвечает Telegram сразу, а апдейт обрабатывает в фоне — но не больше workers
+    апдейтов одновременно, остальные ждут своей очереди. При остановке сервера
+    дожидается уже принятых апдейтов (не дольше drain_timeout) и только потом
+    закрывает сессию бота.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str | None = WEBHOOK_SECRET,
+                 workers: int = WEBHOOK_WORKERS, drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT, **data: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(workers)
+
+    async def _background_feed_update(self, bot: Bot, update: dict[str, Any]) -> None:
+        async with self._slots:
+            await super()._background_feed_update(bot, update)
+
+    async def drain(self):
+        """Ждёт завершения принятых апдейтов; не уложившиеся в drain_timeout отменяются."""
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        logger.info(f"[WEBHOOK] Ожидаю завершения {len(tasks)} апдейтов")
+        _, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"[WEBHOOK] Не дождались {len(pending)} апдейтов за {self.drain_timeout} с, отменены")
+
+    async def close(self) -> None:
+        await self.drain()
+        await super().close()
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """
+    Принимает апдейты через вебхук вместо long polling.
+
+    Поднимает aiohttp-приложение на WEBHOOK_HOST:WEBHOOK_PORT, регистрирует адрес
+    WEBHOOK_BASE_URL + WEBHOOK_PATH в Telegram и работает до SIGINT/SIGTERM.
+    Несколько копий бота за балансировщиком могут обслуживать один и тот же адрес.
+    """
+    app = web.Application()
+    handler = DrainingRequestHandler(dp, bot)
+    handler.register(app, path=WEBHOOK_PATH)
+    # startup/shutdown диспетчера привязываются к жизненному циклу приложения
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+
+    await bot.set_webhook(
+        WEBHOOK_BASE_URL + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logger.info(f"[WEBHOOK] Слушаю {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}, до {WEBHOOK_WORKERS} апдейтов параллельно")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+        logger.info("[WEBHOOK] Получен сигнал остановки")
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        # новые запросы больше не принимаются, принятые апдейты дорабатываются (см. DrainingRequestHandler.close)
+        await runner.cleanup()